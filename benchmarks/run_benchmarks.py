@@ -0,0 +1,376 @@
+"""Offline benchmarks for the deal finder.
+
+Runs the hot paths against a recorded corpus (benchmarks/corpus) served by
+a local stand-in for coles.com.au, so results are repeatable and need no
+network access:
+
+    python benchmarks/run_benchmarks.py                    # run, compare to baseline
+    python benchmarks/run_benchmarks.py --update-baseline  # accept current numbers
+    python benchmarks/run_benchmarks.py --record           # copy the latest crawl snapshots into the corpus
+    python benchmarks/run_benchmarks.py --serve --latency-ms 80   # just run the stand-in server
+
+Each benchmark runs in its own subprocess so peak RSS is measured per
+benchmark. The run fails (exit 1) when throughput drops, or p95 latency or
+peak RSS grows, by more than --tolerance relative to baseline.json.
+"""
+import argparse
+import asyncio
+import glob
+import gzip
+import http.server
+import io
+import json
+import os
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+CORPUS_DIR = os.path.join(BENCH_DIR, 'corpus')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+LIVE_BASE_URL = "https://www.coles.com.au"
+
+sys.path.insert(0, REPO_DIR)
+
+SYNTHETIC_PRODUCT_URLS = 50000
+NAPPY_PRODUCT_SHARE = 50  # Every 50th synthetic product is a nappy
+
+
+def synthetic_product_sitemap(base_url, count=SYNTHETIC_PRODUCT_URLS):
+    """Gzipped product sitemap with `count` URLs, a small share of them nappies"""
+    out = io.BytesIO()
+    with gzip.GzipFile(fileobj=out, mode='wb', mtime=0) as gz:
+        gz.write(b'<?xml version="1.0" encoding="UTF-8"?>\n'
+                 b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for i in range(count):
+            if i % NAPPY_PRODUCT_SHARE == 0:
+                slug = f"huggies-ultra-dry-nappies-size-{i % 6 + 1}-50-pack-{5000000 + i}"
+            else:
+                slug = f"coles-pantry-item-{i}-500g-{6000000 + i}"
+            gz.write(f'  <url><loc>{base_url}/product/{slug}</loc>'
+                     f'<lastmod>2025-06-{i % 28 + 1:02d}</lastmod></url>\n'.encode())
+        gz.write(b'</urlset>\n')
+    return out.getvalue()
+
+
+def corpus_pages():
+    return sorted(glob.glob(os.path.join(CORPUS_DIR, 'pages', '*.html')))
+
+
+def synthetic_large_page(target_bytes=3 * 1024 * 1024):
+    """Multi-megabyte rendered page built by repeating a corpus page's product grid"""
+    with open(corpus_pages()[0], encoding='utf-8') as f:
+        html = f.read()
+    start, end = html.index('<main'), html.index('</main>')
+    grid = html[start:end]
+    copies = max(1, target_bytes // max(1, len(grid)))
+    return html[:start] + grid * copies + html[end:]
+
+
+class CorpusHandler(http.server.BaseHTTPRequestHandler):
+    """Serves the corpus as if it were the retailer, with added latency"""
+
+    latency = 0.0
+    base_url = ''
+    product_sitemap = b''
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b'', content_type='text/html; charset=utf-8'):
+        time.sleep(self.latency)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _corpus_text(self, *parts):
+        with open(os.path.join(CORPUS_DIR, *parts), encoding='utf-8') as f:
+            return f.read().replace(LIVE_BASE_URL, self.base_url).encode('utf-8')
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        pages = corpus_pages()
+        try:
+            if path == '/robots.txt':
+                self._send(200, self._corpus_text('robots.txt'), 'text/plain')
+            elif path == '/sitemap/sitemap-products.xml.gz':
+                self._send(200, self.product_sitemap, 'application/x-gzip')
+            elif path == '/sitemap.xml' or path.startswith('/sitemap/'):
+                self._send(200, self._corpus_text(*path.lstrip('/').split('/')), 'application/xml')
+            elif path.startswith('/browse/') or path.startswith('/product/'):
+                page = pages[sum(map(ord, path)) % len(pages)]
+                self._send(200, self._corpus_text('pages', os.path.basename(page)))
+            else:
+                self._send(404, b'not found')
+        except OSError:
+            self._send(404, b'not found')
+
+
+def start_server(latency_ms=0, port=0):
+    """Start the stand-in server in a daemon thread; returns (server, base_url)"""
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), CorpusHandler)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    CorpusHandler.latency = latency_ms / 1000.0
+    CorpusHandler.base_url = base_url
+    CorpusHandler.product_sitemap = synthetic_product_sitemap(base_url)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, base_url
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name, unit, items, timings):
+    """Throughput and latency percentiles (ms) for a list of per-item timings"""
+    total = sum(timings)
+    return {
+        'name': name,
+        'unit': unit,
+        'items': items,
+        'throughput': items / total if total else 0.0,
+        'p50_ms': percentile(timings, 50) * 1000,
+        'p95_ms': percentile(timings, 95) * 1000,
+        'p99_ms': percentile(timings, 99) * 1000
+    }
+
+
+def bench_sitemap_parsing(repeats=3):
+    import deal_finder
+
+    body = synthetic_product_sitemap(LIVE_BASE_URL)
+    timings = []
+    nappy = 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        nappy = sum(
+            1 for loc, _ in deal_finder.iter_sitemap_entries(io.BytesIO(body))
+            if deal_finder.KEYWORD_MATCHER.contains_any(loc.lower(), 'nappy')
+        )
+        timings.append(time.perf_counter() - started)
+    assert nappy == SYNTHETIC_PRODUCT_URLS // NAPPY_PRODUCT_SHARE, nappy
+    result = summarize('sitemap_parsing', 'urls/s', SYNTHETIC_PRODUCT_URLS * repeats, timings)
+    # Throughput is per URL; latency is per full sitemap pass
+    result['throughput'] = SYNTHETIC_PRODUCT_URLS * repeats / sum(timings)
+    return result
+
+
+def bench_page_analysis(repeats=5):
+    import deal_finder
+
+    pages = []
+    for path in corpus_pages():
+        with open(path, encoding='utf-8') as f:
+            pages.append(f.read())
+    pages.append(synthetic_large_page())
+
+    timings = []
+    for _ in range(repeats):
+        for html in pages:
+            started = time.perf_counter()
+            deal_finder.parse_page(LIVE_BASE_URL + '/browse/baby', html)
+            timings.append(time.perf_counter() - started)
+    result = summarize('page_analysis', 'MB/s', len(timings), timings)
+    result['throughput'] = sum(map(len, pages)) * repeats / (1024 * 1024) / sum(timings)
+    return result
+
+
+def bench_keyword_matching(repeats=20):
+    import deal_finder
+
+    text = re.sub(r'<[^>]+>', ' ', synthetic_large_page()).lower()
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        deal_finder.KEYWORD_MATCHER.match(text)
+        timings.append(time.perf_counter() - started)
+    result = summarize('keyword_matching', 'MB/s', repeats, timings)
+    result['throughput'] = len(text) * repeats / (1024 * 1024) / sum(timings)
+    return result
+
+
+def bench_end_to_end(repeats=3, latency_ms=20, product_pages=40):
+    import deal_finder
+
+    server, base_url = start_server(latency_ms)
+    # Coles' extraction rules, pointed at the stand-in server
+    retailer = deal_finder.ColesAdapter()
+    retailer.base_url = base_url
+    retailer.sitemap_seeds = [f"{base_url}/sitemap.xml"]
+    seeds = [
+        f"{base_url}/browse/baby/nappies-nappy-pants/nappies",
+        f"{base_url}/browse/baby/nappies-nappy-pants"
+    ]
+
+    timings = []
+    pages = 0
+    for _ in range(repeats):
+        cache_dir = tempfile.mkdtemp(prefix='bench-cache-')
+        deal_finder._robots_policies.clear()
+
+        async def run():
+            scheduler = deal_finder.RequestScheduler(max_per_host=8, default_interval=0)
+            cache = deal_finder.ResponseCache(cache_dir)
+            with deal_finder.ParsePool(2) as pool:
+                async with deal_finder.AsyncFetcher(cache=cache, scheduler=scheduler) as fetcher:
+                    return await deal_finder.run_pipeline(
+                        seeds, fetcher, max_product_pages=product_pages, parse_pool=pool,
+                        retailer=retailer
+                    )
+
+        started = time.perf_counter()
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                report = asyncio.run(run())
+            finally:
+                sys.stdout = stdout
+        timings.append(time.perf_counter() - started)
+        pages = len(report['pages'])
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    server.shutdown()
+    assert pages == len(seeds) + product_pages, pages
+    result = summarize('end_to_end', 'pages/s', pages * repeats, timings)
+    result['latency_ms'] = latency_ms
+    return result
+
+
+BENCHMARKS = {
+    'sitemap_parsing': bench_sitemap_parsing,
+    'page_analysis': bench_page_analysis,
+    'keyword_matching': bench_keyword_matching,
+    'end_to_end': bench_end_to_end
+}
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_single(name):
+    """Child-process entry: run one benchmark and print its JSON result"""
+    result = BENCHMARKS[name]()
+    result['peak_rss_mb'] = peak_rss_mb()
+    print(json.dumps(result))
+
+
+def run_isolated(name):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--single', name],
+        check=True, capture_output=True, text=True
+    ).stdout
+    # deal_finder may print on import; the result is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    """Return human-readable regressions against the stored baseline"""
+    regressions = []
+    for result in results:
+        base = baseline.get(result['name'])
+        if not base:
+            continue
+        if result['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{result['name']}: throughput {result['throughput']:.1f} "
+                               f"< baseline {base['throughput']:.1f} {result['unit']}")
+        if result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{result['name']}: p95 {result['p95_ms']:.1f}ms "
+                               f"> baseline {base['p95_ms']:.1f}ms")
+        if result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{result['name']}: peak RSS {result['peak_rss_mb']:.1f}MB "
+                               f"> baseline {base['peak_rss_mb']:.1f}MB")
+    return regressions
+
+
+def record_pages():
+    """Copy the latest crawler snapshot of each page into the corpus"""
+    from deal_finder import SnapshotStore, SNAPSHOT_DIR
+
+    with SnapshotStore(os.path.join(REPO_DIR, SNAPSHOT_DIR)) as store:
+        rows = store.latest()
+        for row in rows:
+            # One file per URL path so re-recording a page replaces it
+            path = urllib.parse.urlsplit(row['url']).path.strip('/')
+            name = re.sub(r'[^a-z0-9]+', '-', path.lower()).strip('-') + '.html'
+            with store.open(row['hash']) as src, \
+                    open(os.path.join(CORPUS_DIR, 'pages', name), 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            print(f"📥 Recorded {name} ({row['captured_at']})")
+    if not rows:
+        print("No page snapshots found - run a crawl first")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', action='append', choices=sorted(BENCHMARKS),
+                        help='run just these benchmarks')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed relative regression before failing (default 0.5)')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--record', action='store_true')
+    parser.add_argument('--serve', action='store_true')
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--single', choices=sorted(BENCHMARKS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        run_single(args.single)
+        return 0
+    if args.record:
+        record_pages()
+        return 0
+    if args.serve:
+        server, base_url = start_server(args.latency_ms, args.port)
+        print(f"🛰️ Serving corpus at {base_url} with {args.latency_ms:.0f}ms latency (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+        return 0
+
+    results = []
+    for name in args.only or list(BENCHMARKS):
+        result = run_isolated(name)
+        results.append(result)
+        print(f"⏱️ {name:17} {result['throughput']:10.1f} {result['unit']:8} "
+              f"p50 {result['p50_ms']:8.1f}ms  p95 {result['p95_ms']:8.1f}ms  "
+              f"p99 {result['p99_ms']:8.1f}ms  peak RSS {result['peak_rss_mb']:6.1f}MB")
+
+    try:
+        with open(BASELINE_PATH, encoding='utf-8') as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        baseline = {}
+
+    if args.update_baseline:
+        baseline.update({result['name']: result for result in results})
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"📝 Baseline written to {BASELINE_PATH}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"❌ REGRESSION {regression}")
+    if not regressions:
+        print("✅ No regressions against baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
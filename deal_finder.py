@@ -1,60 +1,771 @@
 import json
-from datetime import datetime
+import csv
+import sqlite3
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
 import smtplib
 from email.mime.text import MIMEText
 import os
+import io
+import gzip
+import atexit
+import hashlib
+import tempfile
+import threading
+import contextlib
+import importlib.util
+import argparse
+import cProfile
+import pstats
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from collections import namedtuple
 import time
 import re
 import asyncio
 import requests
 import xml.etree.ElementTree as ET
 import urllib.robotparser
+import urllib.parse
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.util.retry import Retry
 
-# Add BeautifulSoup for HTML parsing
-from bs4 import BeautifulSoup
-
-# crawl4ai imports
-try:
-    from crawl4ai import AsyncWebCrawler
-    from crawl4ai.extraction_strategy import CosineStrategy
-    CRAWL4AI_AVAILABLE = True
-    print("✅ crawl4ai is available")
-except ImportError as e:
-    print(f"❌ crawl4ai not installed: {e}")
-    print("Install with: pip install crawl4ai")
-    CRAWL4AI_AVAILABLE = False
-    exit(1)
-except Exception as e:
-    print(f"⚠️ crawl4ai import issue: {e}")
-    print("Will attempt to continue...")
-    CRAWL4AI_AVAILABLE = True
-
-def check_robots_txt_compliance():
-    """Check what URLs are actually allowed by robots.txt"""
-    print("🤖 Checking robots.txt compliance...")
+# Prefer the C-backed lxml parser when it is installed
+HTML_PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+# crawl4ai (and Playwright behind it) is only imported when a browser stage
+# runs, so HTTP-only commands start fast and work without a browser
+AsyncWebCrawler = None
+
+def crawl4ai_available():
+    """Cheap check that crawl4ai is installed, without importing it"""
+    return importlib.util.find_spec('crawl4ai') is not None
+
+def load_crawl4ai():
+    """Import crawl4ai on first use; returns AsyncWebCrawler or None"""
+    global AsyncWebCrawler
+    if AsyncWebCrawler is None:
+        try:
+            from crawl4ai import AsyncWebCrawler as crawler_class
+            AsyncWebCrawler = crawler_class
+            print("✅ crawl4ai is available")
+        except ImportError as e:
+            print(f"❌ crawl4ai not installed: {e}")
+            print("Install with: pip install crawl4ai")
+    return AsyncWebCrawler
+
+COLES_BASE_URL = "https://www.coles.com.au"
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+BOT_USER_AGENT = 'Mozilla/5.0 (compatible; diaper-deals-tracker/1.0; +https://github.com/pkamat25/diaper-deals-tracker)'
+ROBOTS_USER_AGENT = "diaper-deals-bot"
+
+SITEMAP_SEEDS = [
+    f"{COLES_BASE_URL}/sitemap.xml",  # Main sitemap
+    f"{COLES_BASE_URL}/sitemap/sitemap-specials.xml",  # Specials
+    f"{COLES_BASE_URL}/sitemap/sitemap-products.xml",  # Products
+    f"{COLES_BASE_URL}/sitemap/sitemap-browse.xml"     # Browse pages
+]
+
+METRICS_JSON_PATH = os.path.join('docs', 'run_metrics.json')
+
+class RunMetrics:
+    """Thread-safe spans (timed stages) and counters for one run.
+
+    Span names are dotted by stage, e.g. 'http.connect', 'http.ttfb',
+    'http.download', 'render', 'parse.soup', 'parse.match'.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans = {}
+        self.counters = {}
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.spans.setdefault(name, []).append(seconds)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextlib.contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def snapshot(self):
+        with self._lock:
+            spans = {name: sorted(samples) for name, samples in self.spans.items()}
+            counters = dict(self.counters)
+        summary = {}
+        for name, samples in sorted(spans.items()):
+            summary[name] = {
+                'count': len(samples),
+                'total_s': round(sum(samples), 4),
+                'p50_ms': round(samples[len(samples) // 2] * 1000, 2),
+                'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2),
+                'max_ms': round(samples[-1] * 1000, 2)
+            }
+        return {
+            'started_at': self.started_at.isoformat(),
+            'wall_time_s': round(time.perf_counter() - self._started, 3),
+            'spans': summary,
+            'counters': dict(sorted(counters.items()))
+        }
+
+    def write(self, path=METRICS_JSON_PATH):
+        """Write the machine-readable metrics file for this run"""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        print(f"  📈 Metrics written to {path}")
+
+METRICS = RunMetrics()
+
+HTTP_CACHE_DIR = os.environ.get('DEAL_CACHE_DIR', '.http_cache')
+HTTP_CACHE_MAX_BYTES = int(os.environ.get('DEAL_CACHE_MAX_MB', '256')) * 1024 * 1024
+
+class ResponseCache:
+    """On-disk HTTP body cache keyed by URL, revalidated with ETag/Last-Modified.
+
+    Bodies are stored decoded, one file per URL, next to a JSON index of
+    validators and last-use times. When the cache grows past max_bytes the
+    least recently used entries are evicted.
+    """
+
+    def __init__(self, directory=HTTP_CACHE_DIR, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, 'index.json')
+        self._lock = threading.Lock()
+        self._dirty = False
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def _body_path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest())
+
+    def lookup(self, url):
+        """Return the cache entry for a URL if its body is still on disk"""
+        with self._lock:
+            entry = self.index.get(url)
+            if entry and os.path.exists(self._body_path(url)):
+                return dict(entry, body_path=self._body_path(url))
+            return None
+
+    def conditional_headers(self, url):
+        """Validators to send so the server can answer 304 Not Modified"""
+        entry = self.lookup(url)
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def touch(self, url):
+        with self._lock:
+            if url in self.index:
+                self.index[url]['last_used'] = time.time()
+                self._dirty = True
+
+    def new_temp_file(self):
+        return tempfile.NamedTemporaryFile(dir=self.directory, prefix='.tmp-', delete=False)
+
+    def commit(self, url, headers, temp_path):
+        """Move a fully written body into place and record its validators"""
+        if not (headers.get('ETag') or headers.get('Last-Modified')):
+            os.unlink(temp_path)
+            return
+        os.replace(temp_path, self._body_path(url))
+        with self._lock:
+            self.index[url] = {
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'content_type': headers.get('Content-Type'),
+                'size': os.path.getsize(self._body_path(url)),
+                'last_used': time.time()
+            }
+            self._dirty = True
+            self._evict()
+
+    def store(self, url, headers, body):
+        tmp = self.new_temp_file()
+        with tmp:
+            tmp.write(body)
+        self.commit(url, headers, tmp.name)
+
+    def _evict(self):
+        total = sum(entry['size'] for entry in self.index.values())
+        if total <= self.max_bytes:
+            return
+        for url, entry in sorted(self.index.items(), key=lambda item: item[1]['last_used']):
+            try:
+                os.unlink(self._body_path(url))
+            except OSError:
+                pass
+            del self.index[url]
+            total -= entry['size']
+            if total <= self.max_bytes:
+                break
+
+    def save(self):
+        """Persist the index if anything changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp = self.new_temp_file()
+            with open(tmp.name, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f)
+            tmp.close()
+            os.replace(tmp.name, self.index_path)
+            self._dirty = False
+
+_response_cache = None
+
+def get_response_cache():
+    """Shared ResponseCache for the run; the index is saved at exit"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+        atexit.register(_response_cache.save)
+    return _response_cache
+
+class CachedResponse:
+    """Minimal requests.Response stand-in for bodies served through the cache"""
+
+    def __init__(self, url, status_code, headers, body_path=None, raw=None, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.from_cache = from_cache
+        self._body_path = body_path
+        self._raw = raw
+        self._content = None
+
+    @property
+    def raw(self):
+        if self._raw is None:
+            self._raw = open(self._body_path, 'rb')
+        return self._raw
+
+    @property
+    def content(self):
+        # Reading the whole body ends the stream, so its file is closed here
+        if self._content is None:
+            if self._raw is None:
+                with open(self._body_path, 'rb') as f:
+                    self._content = f.read()
+            else:
+                self._content = self._raw.read()
+                self._raw.close()
+        return self._content
+
+    @property
+    def text(self):
+        encoding = requests.utils.get_encoding_from_headers(self.headers) or 'utf-8'
+        return self.content.decode(encoding, errors='replace')
+
+    def close(self):
+        if self._raw is not None:
+            self._raw.close()
+
+class _CacheTee(io.RawIOBase):
+    """Readable stream that copies a response body into the cache as it is read"""
+
+    def __init__(self, response, cache, url):
+        response.raw.decode_content = True
+        self.response = response
+        self.cache = cache
+        self.url = url
+        self.tmp = cache.new_temp_file()
+        self.complete = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.response.raw.read(len(buffer))
+        if not data:
+            self.complete = True
+            return 0
+        buffer[:len(data)] = data
+        self.tmp.write(data)
+        METRICS.incr('http.bytes', len(data))
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.tmp.close()
+            if self.complete:
+                self.cache.commit(self.url, self.response.headers, self.tmp.name)
+            else:
+                os.unlink(self.tmp.name)
+            self.response.close()
+        super().close()
+
+class TimedHTTPConnection(HTTPConnection):
+    """Records DNS + TCP connect time for every new connection"""
+
+    def connect(self):
+        with METRICS.span('http.connect'):
+            super().connect()
+        METRICS.incr('http.connections')
+
+class TimedHTTPSConnection(HTTPSConnection):
+    """Records DNS + TCP + TLS handshake time for every new connection"""
+
+    def connect(self):
+        with METRICS.span('http.connect'):
+            super().connect()
+        METRICS.incr('http.connections')
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class InstrumentedAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections report connect timings"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool
+        }
+
+MAX_RETRY_AFTER = float(os.environ.get('DEAL_MAX_RETRY_AFTER', '30'))
+
+class CappedRetry(Retry):
+    """Retry that honours Retry-After, but never sleeps longer than MAX_RETRY_AFTER seconds"""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, MAX_RETRY_AFTER)
+
+HTTP_RETRIES = CappedRetry(
+    total=2, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=('GET', 'HEAD'), respect_retry_after_header=True,
+    raise_on_status=False
+)
+
+def create_session(user_agent=BOT_USER_AGENT, pool_size=8):
+    """requests.Session with keep-alive pooling and our respectful headers"""
+    session = requests.Session()
+    session.headers.update({
+        'User-Agent': user_agent,
+        'Accept-Language': 'en-AU,en;q=0.5',
+        'Accept-Encoding': 'gzip, deflate',
+        'DNT': '1',
+        'Connection': 'keep-alive'
+    })
+    adapter = InstrumentedAdapter(
+        pool_connections=8, pool_maxsize=pool_size, max_retries=HTTP_RETRIES
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def timed_get(session, url, headers=None, timeout=15, stream=False):
+    """session.get that records TTFB, retries and status counters"""
+    response = session.get(url, headers=headers, timeout=timeout, stream=True)
+    METRICS.incr('http.requests')
+    METRICS.incr(f'http.status.{response.status_code}')
+    # elapsed runs from sending the request to parsing the headers
+    METRICS.record('http.ttfb', response.elapsed.total_seconds())
+    retries = getattr(response.raw, 'retries', None)
+    if retries is not None and retries.history:
+        METRICS.incr('http.retries', len(retries.history))
+    if not stream:
+        with METRICS.span('http.download'):
+            METRICS.incr('http.bytes', len(response.content))
+    return response
+
+def cached_get(session, url, headers=None, timeout=15, stream=False, cache=None):
+    """GET through the response cache, revalidating stored bodies.
+
+    A 304 is answered from disk; a fresh 200 is written to the cache (while
+    streaming, when stream=True). Without a cache this is a plain GET.
+    """
+    if cache is None:
+        return timed_get(session, url, headers=headers, timeout=timeout, stream=stream)
+
+    request_headers = dict(headers or {})
+    request_headers.update(cache.conditional_headers(url))
+    response = timed_get(session, url, headers=request_headers, timeout=timeout, stream=True)
+
+    if response.status_code == 304:
+        entry = cache.lookup(url)
+        response.close()
+        if entry:
+            cache.touch(url)
+            METRICS.incr('http.cache_hits')
+            METRICS.incr('http.cache_bytes_saved', entry.get('size', 0))
+            return CachedResponse(
+                url, 200, {'Content-Type': entry.get('content_type') or ''},
+                body_path=entry['body_path'], from_cache=True
+            )
+        # Body vanished between lookup and reply; fetch unconditionally
+        return timed_get(session, url, headers=headers, timeout=timeout, stream=stream)
+
+    METRICS.incr('http.cache_misses')
+    if response.status_code != 200:
+        return response
+
+    if stream:
+        return CachedResponse(
+            url, 200, response.headers, raw=_CacheTee(response, cache, url)
+        )
+
+    with METRICS.span('http.download'):
+        body = response.content
+    METRICS.incr('http.bytes', len(body))
+    cache.store(url, response.headers, body)
+    return response
+
+ROBOTS_TTL = 6 * 3600  # Re-read robots.txt at most every 6 hours
+ROBOTS_RETRY_TTL = 300  # Retry sooner when robots.txt could not be read
+
+class RobotsPolicy:
+    """Parsed robots.txt for one origin with memoized can_fetch answers.
+
+    robots.txt rules are prefix matches, so the answer for a URL only
+    depends on its first N path characters, where N is the longest rule
+    path. Answers are memoized under that prefix.
+    """
+
+    def __init__(self, origin, parser, ttl=ROBOTS_TTL, error=None):
+        self.origin = origin
+        self.parser = parser
+        self.ttl = ttl
+        self.error = error
+        self.fetched_at = time.time()
+        self._answers = {}
+
+        entries = list(parser.entries)
+        if parser.default_entry:
+            entries.append(parser.default_entry)
+        self._prefix_len = max(
+            (len(rule.path) for entry in entries for rule in entry.rulelines), default=0
+        )
+
+    def is_fresh(self):
+        return time.time() - self.fetched_at < self.ttl
+
+    def _prefix(self, url):
+        # Same normalisation RobotFileParser.can_fetch applies
+        parsed = urllib.parse.urlparse(urllib.parse.unquote(url))
+        path = urllib.parse.quote(urllib.parse.urlunparse(
+            ('', '', parsed.path, parsed.params, parsed.query, parsed.fragment)
+        )) or '/'
+        return path[:self._prefix_len]
+
+    def can_fetch(self, url):
+        key = self._prefix(url)
+        if key not in self._answers:
+            self._answers[key] = self.parser.can_fetch(ROBOTS_USER_AGENT, url)
+        return self._answers[key]
+
+    def pacing(self):
+        """(interval, burst) the site asks for, or (None, None) if unstated.
+
+        Crawl-delay means one request every N seconds; Request-rate r/s
+        allows bursts of r requests refilled over s seconds.
+        """
+        delay = self.parser.crawl_delay(ROBOTS_USER_AGENT)
+        rate = self.parser.request_rate(ROBOTS_USER_AGENT)
+        interval, burst = None, None
+        if rate and rate.requests:
+            interval, burst = rate.seconds / rate.requests, rate.requests
+        if delay is not None and (interval is None or float(delay) >= interval):
+            interval, burst = float(delay), 1
+        return interval, burst
+
+_robots_policies = {}
+_robots_locks = {}
+_robots_registry_lock = threading.Lock()
+
+def load_robots_policy(origin, session=None, cache=None):
+    """Download and parse robots.txt for an origin (through the response cache)"""
+    parser = urllib.robotparser.RobotFileParser()
+    parser.set_url(f"{origin}/robots.txt")
+    owns_session = session is None
+    session = session or create_session()
+    try:
+        with METRICS.span('robots.load'):
+            response = cached_get(session, parser.url, cache=cache or get_response_cache())
+        if response.status_code in (401, 403):
+            parser.disallow_all = True
+        elif response.status_code == 429 or response.status_code >= 500:
+            # The rules exist but can't be read right now: fetch nothing
+            # until a retry succeeds
+            print(f"    ⚠️ robots.txt for {origin} returned HTTP {response.status_code}")
+            parser.disallow_all = True
+            return RobotsPolicy(origin, parser, ttl=ROBOTS_RETRY_TTL, error=f"HTTP {response.status_code}")
+        elif response.status_code >= 400:
+            # No robots.txt at all means no restrictions
+            parser.allow_all = True
+        else:
+            parser.parse(response.text.splitlines())
+        return RobotsPolicy(origin, parser)
+    except Exception as e:
+        print(f"    ⚠️ Could not read robots.txt for {origin}: {e}")
+        parser.disallow_all = True
+        return RobotsPolicy(origin, parser, ttl=ROBOTS_RETRY_TTL, error=str(e))
+    finally:
+        if owns_session:
+            session.close()
+
+def get_robots_policy(origin, session=None, cache=None):
+    """Shared RobotsPolicy for an origin, reloaded once its TTL expires"""
+    with _robots_registry_lock:
+        lock = _robots_locks.setdefault(origin, threading.Lock())
+    with lock:
+        policy = _robots_policies.get(origin)
+        if policy is None or not policy.is_fresh():
+            policy = load_robots_policy(origin, session, cache)
+            _robots_policies[origin] = policy
+        return policy
+
+def url_origin(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+MAX_CONNECTIONS = int(os.environ.get('DEAL_MAX_CONNECTIONS', '16'))
+
+class RequestScheduler:
+    """Central pacing point that every fetcher goes through.
+
+    Each host gets a concurrency limit and a token bucket sized from its
+    robots.txt Crawl-delay/Request-rate, so requests are packed as densely
+    as the site allows; hosts without a stated policy use default_interval.
+    On top of the per-host budgets, at most max_total requests are in
+    flight across all hosts.
+    """
+
+    def __init__(self, max_per_host=4, default_interval=0.25, max_total=MAX_CONNECTIONS):
+        self.max_per_host = max_per_host
+        self.default_interval = default_interval
+        self.max_total = max_total
+        self._hosts = {}
+        self._total = None
+
+    def _host_state(self, host):
+        # asyncio primitives are created lazily so they bind to the running loop
+        if host not in self._hosts:
+            self._hosts[host] = {
+                'semaphore': asyncio.Semaphore(self.max_per_host),
+                'lock': asyncio.Lock(),
+                'tokens': None,
+                'updated': time.monotonic()
+            }
+        return self._hosts[host]
+
+    async def policy_for(self, url, session=None, cache=None):
+        return await asyncio.to_thread(get_robots_policy, url_origin(url), session, cache)
+
+    async def can_fetch(self, url, session=None, cache=None):
+        policy = await self.policy_for(url, session, cache)
+        return policy.can_fetch(url)
+
+    async def _take_token(self, state, interval, burst):
+        async with state['lock']:
+            if state['tokens'] is None:
+                state['tokens'] = float(burst)
+            while True:
+                now = time.monotonic()
+                state['tokens'] = min(
+                    burst, state['tokens'] + (now - state['updated']) / interval
+                )
+                state['updated'] = now
+                if state['tokens'] >= 1:
+                    state['tokens'] -= 1
+                    return
+                await asyncio.sleep((1 - state['tokens']) * interval)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, url, session=None, cache=None):
+        """Hold a paced request slot for url's host for the duration of the block.
+
+        robots.txt is read through `cache` (the shared response cache by
+        default), like the caller's own requests.
+        """
+        policy = await self.policy_for(url, session, cache)
+        interval, burst = policy.pacing()
+        if interval is None:
+            interval, burst = self.default_interval, 1
+
+        state = self._host_state(urlsplit(url).netloc)
+        if self._total is None:
+            self._total = asyncio.Semaphore(self.max_total)
+        async with state['semaphore']:
+            if interval > 0:
+                await self._take_token(state, interval, burst)
+            # Taken last, so requests waiting on a host's pacing hold no global slot
+            async with self._total:
+                yield
+
+_request_scheduler = None
+
+def get_request_scheduler():
+    global _request_scheduler
+    if _request_scheduler is None:
+        _request_scheduler = RequestScheduler()
+    return _request_scheduler
+
+class AsyncFetcher:
+    """Pooled keep-alive HTTP client that fetches through the RequestScheduler.
+
+    Blocking requests calls run in worker threads so they never stall the
+    event loop. URLs disallowed by the host's robots.txt are never fetched.
+    """
+
+    def __init__(self, timeout=15, user_agent=BOT_USER_AGENT, cache=None, scheduler=None):
+        self.timeout = timeout
+        self.cache = cache if cache is not None else get_response_cache()
+        self.scheduler = scheduler or get_request_scheduler()
+        self.session = create_session(user_agent, pool_size=self.scheduler.max_per_host * 2)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+        self.cache.save()
+
+    async def fetch(self, url, headers=None, timeout=None, stream=False):
+        """Fetch a URL politely; returns None when robots.txt disallows it
+
+        With stream=True the body is left unread so it can be parsed as it
+        arrives; the caller must close the response.
+        """
+        if not await self.scheduler.can_fetch(url, self.session, self.cache):
+            print(f"    🚫 robots.txt disallows: {url}")
+            return None
+
+        async with self.scheduler.slot(url, self.session, self.cache):
+            return await asyncio.to_thread(
+                cached_get, self.session, url, headers=headers,
+                timeout=timeout or self.timeout, stream=stream, cache=self.cache
+            )
+
+    async def fetch_many(self, urls, **kwargs):
+        """Fetch URLs concurrently; failed fetches come back as exceptions"""
+        return await asyncio.gather(
+            *(self.fetch(url, **kwargs) for url in urls), return_exceptions=True
+        )
+
+class RetailerAdapter:
+    """Everything the crawler needs to know about one retailer.
+
+    Subclasses give the site's base URL, the sitemaps product pages are
+    discovered from, the listing (browse) pages to crawl and the URLs whose
+    robots.txt permissions are reported. They may override how
+    sitemap URLs are classified and how products are extracted. Decorate
+    them with @register_retailer so every run includes them.
+    """
+
+    name = None
+    base_url = None
+    sitemap_seeds = []
+    listing_urls = []
+    robots_test_urls = []
+
+    @property
+    def host(self):
+        return urlsplit(self.base_url).netloc
+
+    def robots_policy(self):
+        return get_robots_policy(self.base_url)
+
+    def is_product_url(self, url):
+        """Whether a sitemap URL looks like a nappy product page"""
+        return KEYWORD_MATCHER.contains_any(url.lower(), 'nappy')
+
+    def product_url(self, slug, product_id):
+        return f"{self.base_url}/product/{slug}-{product_id}"
+
+    def extract_products(self, html_content, page_url):
+        """ProductRecords embedded in a page (__NEXT_DATA__ / JSON-LD)"""
+        return extract_embedded_products(html_content, page_url, self)
+
+RETAILERS = {}
+
+def register_retailer(adapter_class):
+    """Class decorator adding a retailer adapter to the registry"""
+    RETAILERS[adapter_class.name] = adapter_class()
+    return adapter_class
+
+def get_retailers(names=None):
+    return [RETAILERS[name] for name in (names or RETAILERS)]
+
+def retailer_for_url(url):
+    """Adapter for the host serving url, or None for an unknown host"""
+    host = urlsplit(url).netloc
+    for adapter in RETAILERS.values():
+        if adapter.host == host:
+            return adapter
+    return None
+
+@register_retailer
+class ColesAdapter(RetailerAdapter):
+    name = 'Coles'
+    base_url = COLES_BASE_URL
+    sitemap_seeds = SITEMAP_SEEDS
+    listing_urls = [
+        f"{COLES_BASE_URL}/browse/baby/nappies-nappy-pants/nappies",
+        f"{COLES_BASE_URL}/browse/baby/nappies-nappy-pants",
+        f"{COLES_BASE_URL}/browse/baby"
+    ]
+    robots_test_urls = [
+        f"{COLES_BASE_URL}/browse/baby/nappies-nappy-pants/nappies",
+        f"{COLES_BASE_URL}/browse/baby/nappies-nappy-pants",
+        f"{COLES_BASE_URL}/browse/baby",
+        f"{COLES_BASE_URL}/sitemap/sitemap-specials.xml",
+        f"{COLES_BASE_URL}/specials"
+    ]
+
+def check_robots_txt_compliance(retailer):
+    """Check what URLs are actually allowed by robots.txt.
+
+    An unreadable robots.txt allows nothing, so no URLs are returned.
+    """
+    print(f"🤖 Checking robots.txt compliance for {retailer.name}...")
     
     try:
-        # Parse Coles robots.txt
-        rp = urllib.robotparser.RobotFileParser()
-        rp.set_url("https://www.coles.com.au/robots.txt")
-        rp.read()
-        
-        # Test URLs we want to use
-        test_urls = [
-            "https://www.coles.com.au/browse/baby/nappies-nappy-pants/nappies",
-            "https://www.coles.com.au/browse/baby/nappies-nappy-pants", 
-            "https://www.coles.com.au/browse/baby",
-            "https://www.coles.com.au/sitemap/sitemap-specials.xml",
-            "https://www.coles.com.au/specials"
-        ]
-        
-        user_agent = "diaper-deals-bot"
+        # Shared, TTL-cached robots.txt policy for the retailer's host
+        policy = retailer.robots_policy()
+        if policy.error:
+            print(f"    ❌ robots.txt unreadable ({policy.error}) - treating every URL as blocked")
+            return []
         
         print("    Checking URL permissions:")
         allowed_urls = []
         
-        for url in test_urls:
-            is_allowed = rp.can_fetch(user_agent, url)
+        # Test URLs we want to use
+        for url in retailer.robots_test_urls:
+            is_allowed = policy.can_fetch(url)
             status = "✅ ALLOWED" if is_allowed else "❌ BLOCKED"
             print(f"      {status}: {url}")
             
@@ -66,116 +777,206 @@ def check_robots_txt_compliance():
         
     except Exception as e:
         print(f"    ❌ Error checking robots.txt: {e}")
-        # Fallback to conservative list
-        return [
-            "https://www.coles.com.au/browse/baby/nappies-nappy-pants/nappies",
-            "https://www.coles.com.au/browse/baby/nappies-nappy-pants"
-        ]
+        return []
+
+def open_sitemap_stream(raw):
+    """Wrap a raw byte stream, transparently gunzipping .xml.gz bodies"""
+    if isinstance(raw, requests.Response):
+        raw.raw.decode_content = True  # Undo Content-Encoding: gzip
+        raw = raw.raw
+    elif isinstance(raw, CachedResponse):
+        raw = raw.raw
+    buffered = raw if hasattr(raw, 'peek') else io.BufferedReader(raw)
+    if buffered.peek(2)[:2] == b'\x1f\x8b':
+        return gzip.GzipFile(fileobj=buffered)
+    return buffered
+
+def iter_sitemap_entries(source, info=None):
+    """Stream (loc, lastmod) records out of a sitemap or sitemap index.
+
+    Parses incrementally with iterparse and clears each entry once read, so
+    memory stays flat however many <url> entries the sitemap has. If an
+    info dict is passed, info['is_index'] is set once the root tag is seen.
+    """
+    stream = open_sitemap_stream(source)
+    root = None
+
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+                if info is not None:
+                    info['is_index'] = 'sitemapindex' in elem.tag
+            continue
+
+        if elem.tag not in (f'{SITEMAP_NS}url', f'{SITEMAP_NS}sitemap'):
+            continue
+
+        loc = elem.findtext(f'{SITEMAP_NS}loc')
+        lastmod = elem.findtext(f'{SITEMAP_NS}lastmod')
+        if loc:
+            yield loc.strip(), lastmod.strip() if lastmod else None
+
+        # Drop the finished entry and its reference from the root
+        elem.clear()
+        root.clear()
+
+def summarize_sitemap(sitemap_url, source):
+    """Print what a sitemap contains while streaming through it once.
+
+    Returns a summary dict; 'sub_sitemaps' lists the children of an index.
+    """
+    info = {}
+    summary = {
+        'url_count': 0,
+        'nappy_urls': [],
+        'sub_sitemaps': []
+    }
 
-async def debug_sitemap_thoroughly():
-    """Thoroughly debug the sitemap approach"""
+    for loc, lastmod in iter_sitemap_entries(source, info):
+        if info.get('is_index'):
+            summary['sub_sitemaps'].append(loc)
+            continue
+        summary['url_count'] += 1
+        # Look for nappy-related URLs
+        if KEYWORD_MATCHER.contains_any(loc.lower(), 'nappy'):
+            summary['nappy_urls'].append(loc)
+
+    # Check if it's a sitemap index or regular sitemap
+    if info.get('is_index'):
+        print(f"    📂 {sitemap_url} is a sitemap INDEX with {len(summary['sub_sitemaps'])} sub-sitemaps")
+        for i, sub_url in enumerate(summary['sub_sitemaps'][:5]):
+            print(f"      {i+1}. {sub_url}")
+    else:
+        print(f"    📄 {sitemap_url} is a regular sitemap with {summary['url_count']} URLs")
+        print(f"    🍼 Nappy-related URLs: {len(summary['nappy_urls'])}")
+        for url in summary['nappy_urls'][:3]:
+            print(f"      - {url}")
+
+    return summary
+
+async def parse_sitemap_response(sitemap_url, response):
+    """Stream-parse a sitemap response off the event loop"""
+    try:
+        return await asyncio.to_thread(summarize_sitemap, sitemap_url, response)
+    finally:
+        response.close()
+
+async def debug_sitemap_thoroughly(fetcher=None, max_depth=2, retailers=None):
+    """Thoroughly debug the sitemap approach.
+
+    Fetches every retailer's sitemap index and known sitemaps concurrently
+    (all registered retailers unless `retailers` is given), then
+    expands every sub-sitemap an index lists and fetches those concurrently
+    too, so discovery takes as long as the slowest request.
+    """
     print("\n🗺️ DEBUGGING SITEMAP APPROACH")
     print("=" * 50)
-    
+
+    owns_fetcher = fetcher is None
+    if owns_fetcher:
+        fetcher = AsyncFetcher()
+
     try:
-        # First check if we can access sitemaps
-        sitemap_urls = [
-            "https://www.coles.com.au/sitemap.xml",  # Main sitemap
-            "https://www.coles.com.au/sitemap/sitemap-specials.xml",  # Specials
-            "https://www.coles.com.au/sitemap/sitemap-products.xml",  # Products
-            "https://www.coles.com.au/sitemap/sitemap-browse.xml"     # Browse pages
-        ]
-        
+        # Sitemap index plus the sitemaps we know about, for every retailer
+        retailers = retailers or get_retailers()
+        print(f"  🏪 Retailers: {', '.join(retailer.name for retailer in retailers)}")
+        pending = [url for retailer in retailers for url in retailer.sitemap_seeds]
+
         working_sitemaps = []
-        
-        for sitemap_url in sitemap_urls:
-            try:
-                print(f"  📋 Testing: {sitemap_url}")
-                response = requests.get(sitemap_url, timeout=10)
+        seen = set()
+        depth = 0
+
+        while pending and depth <= max_depth:
+            batch = [url for url in dict.fromkeys(pending) if url not in seen]
+            seen.update(batch)
+            pending = []
+
+            print(f"  📋 Fetching {len(batch)} sitemaps concurrently...")
+            started = time.monotonic()
+            responses = await fetcher.fetch_many(batch, stream=True)
+            print(f"    ⏱️ Responses started in {time.monotonic() - started:.2f}s")
+
+            parse_jobs = []
+            for sitemap_url, response in zip(batch, responses):
+                if isinstance(response, Exception):
+                    print(f"    ❌ Error accessing {sitemap_url}: {response}")
+                    continue
+                if response is None:
+                    continue
+
+                print(f"  📋 {sitemap_url}")
                 print(f"    Status: {response.status_code}")
-                print(f"    Size: {len(response.text)} chars")
-                
-                if response.status_code == 200:
-                    working_sitemaps.append((sitemap_url, response.text))
-                    
-                    # Parse and analyze
-                    try:
-                        root = ET.fromstring(response.text)
-                        
-                        # Check if it's a sitemap index or regular sitemap
-                        if "sitemapindex" in root.tag:
-                            print("    📂 This is a sitemap INDEX")
-                            sitemaps = root.findall('.//{http://www.sitemaps.org/schemas/sitemap/0.9}sitemap')
-                            print(f"    Contains {len(sitemaps)} sub-sitemaps:")
-                            for i, sm in enumerate(sitemaps[:5]):
-                                loc = sm.find('{http://www.sitemaps.org/schemas/sitemap/0.9}loc')
-                                if loc is not None:
-                                    print(f"      {i+1}. {loc.text}")
-                        else:
-                            print("    📄 This is a regular sitemap")
-                            urls = root.findall('.//{http://www.sitemaps.org/schemas/sitemap/0.9}url')
-                            print(f"    Contains {len(urls)} URLs")
-                            
-                            # Look for nappy-related URLs
-                            nappy_keywords = ['napp', 'diaper', 'huggies', 'pampers', 'babylove']
-                            nappy_urls = []
-                            
-                            for url_elem in urls:
-                                loc = url_elem.find('{http://www.sitemaps.org/schemas/sitemap/0.9}loc')
-                                if loc is not None:
-                                    url_text = loc.text
-                                    if any(keyword in url_text.lower() for keyword in nappy_keywords):
-                                        nappy_urls.append(url_text)
-                            
-                            print(f"    🍼 Nappy-related URLs: {len(nappy_urls)}")
-                            for url in nappy_urls[:3]:
-                                print(f"      - {url}")
-                                
-                    except ET.ParseError as e:
-                        print(f"    ❌ XML parsing error: {e}")
-                        print(f"    📝 Content preview: {response.text[:200]}...")
-                        
-            except Exception as e:
-                print(f"    ❌ Error accessing {sitemap_url}: {e}")
-        
+                print(f"    Content-Type: {response.headers.get('content-type', 'unknown')}")
+
+                if response.status_code != 200:
+                    response.close()
+                    continue
+
+                parse_jobs.append((sitemap_url, parse_sitemap_response(sitemap_url, response)))
+
+            # Parse and analyze as the bodies stream in
+            summaries = await asyncio.gather(
+                *(job for _, job in parse_jobs), return_exceptions=True
+            )
+            for (sitemap_url, _), summary in zip(parse_jobs, summaries):
+                if isinstance(summary, ET.ParseError):
+                    print(f"    ❌ XML parsing error in {sitemap_url}: {summary}")
+                    continue
+                if isinstance(summary, Exception):
+                    print(f"    ❌ Error reading {sitemap_url}: {summary}")
+                    continue
+                working_sitemaps.append((sitemap_url, summary))
+                pending.extend(summary['sub_sitemaps'])
+
+            depth += 1
+
         print(f"\n  📊 Summary: {len(working_sitemaps)} working sitemaps found")
         return working_sitemaps
-        
+
     except Exception as e:
         print(f"  ❌ Sitemap debugging error: {e}")
         return []
+    finally:
+        if owns_fetcher:
+            fetcher.close()
 
-def debug_manual_allowed_pages():
-    """Test only robots.txt allowed pages with manual requests"""
+async def debug_manual_allowed_pages(fetcher=None, retailers=None):
+    """Test only robots.txt allowed pages with manual requests.
+
+    Covers the listing pages of every registered retailer unless
+    `retailers` is given.
+    """
     print("\n📖 DEBUGGING ALLOWED BROWSE PAGES")
     print("=" * 50)
     
     # Only test URLs we know are allowed
-    allowed_urls = [
-        "https://www.coles.com.au/browse/baby/nappies-nappy-pants/nappies",
-        "https://www.coles.com.au/browse/baby/nappies-nappy-pants",
-        "https://www.coles.com.au/browse/baby"
-    ]
+    allowed_urls = [url for retailer in retailers or get_retailers() for url in retailer.listing_urls]
     
     results = {}
+    owns_fetcher = fetcher is None
+    if owns_fetcher:
+        fetcher = AsyncFetcher()
+
+    # Use respectful headers
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (compatible; diaper-deals-tracker/1.0; respectful-bot)',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'
+    }
+
+    # Requests are paced by the scheduler, so they can all be queued at once
+    responses = await fetcher.fetch_many(allowed_urls, headers=headers)
     
-    for url in allowed_urls:
+    for url, response in zip(allowed_urls, responses):
         print(f"  🎯 Testing allowed URL: {url}")
         
         try:
-            # Use respectful headers
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (compatible; diaper-deals-tracker/1.0; respectful-bot)',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'en-AU,en;q=0.5',
-                'Accept-Encoding': 'gzip, deflate',
-                'DNT': '1',
-                'Connection': 'keep-alive'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=15)
+            if isinstance(response, Exception):
+                raise response
+            if response is None:
+                continue
             
-            print(f"    Status: {response.status_code}")
+            print(f"    Status: {response.status_code}{' (cached, not modified)' if getattr(response, 'from_cache', False) else ''}")
             print(f"    Content-Type: {response.headers.get('content-type', 'unknown')}")
             print(f"    Content-Length: {len(response.text)}")
             
@@ -198,10 +999,239 @@ def debug_manual_allowed_pages():
                 
         except Exception as e:
             print(f"    ❌ Request error: {e}")
+        finally:
+            if response is not None and not isinstance(response, Exception):
+                response.close()
     
+    if owns_fetcher:
+        fetcher.close()
     return results
 
-def analyze_page_content(html_content, url):
+# Shared keyword dictionary; add brands or indicators here and every
+# analyzer picks them up through KEYWORD_MATCHER
+KEYWORD_CATEGORIES = {
+    'nappy': [
+        'napp', 'diaper', 'huggies', 'pampers', 'babylove', 'rascal',
+        'tooshies', 'millie moon', 'bambo nature'
+    ],
+    'member': [
+        'member price', 'member only', 'sign in to see', 'login to see',
+        'flybuys member', 'member special', 'exclusive member'
+    ],
+    'member_hint': ['member price', 'sign in', 'login', 'flybuys'],
+    'blocking': ['incapsula', 'blocked', 'access denied', 'captcha', 'cloudflare']
+}
+
+def compile_trie_pattern(terms):
+    """One regex for many literal terms, factored as a prefix trie.
+
+    Unlike a flat alternation the engine branches once per character
+    instead of trying every term in turn, and the longest term at a
+    position wins because each optional tail is greedy.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:%s)' % '|'.join(branches)
+        return '(?:%s)?' % body if '' in node else body
+
+    # An empty pattern would match everywhere; (?!) never matches
+    return re.compile(build(trie) or '(?!)')
+
+class KeywordMatcher:
+    """Count keywords from many categories in a single pass over the text.
+
+    All terms are compiled into one trie-shaped pattern, so the scan costs
+    about the same however many terms there are. Each match is the longest
+    term at its position and also credits the shorter terms it starts with.
+    Where another term could start inside a match ('flybuys member' and
+    'member special') those offsets are checked too, and a term is only
+    counted again once its previous occurrence has ended, so counts agree
+    with per-term str.count.
+    """
+
+    def __init__(self, categories):
+        self.categories = {
+            category: [term.lower() for term in terms]
+            for category, terms in categories.items()
+        }
+        terms = sorted({term for terms in self.categories.values() for term in terms})
+        self.pattern = compile_trie_pattern(terms)
+        self.prefixes = {
+            term: [other for other in terms if term.startswith(other)]
+            for term in terms
+        }
+        # Offsets inside each term where another term could start: a tail
+        # that is itself a term's prefix, or that begins with a term
+        term_set = set(terms)
+        term_prefixes = {term[:i] for term in terms for i in range(1, len(term) + 1)}
+        self.inner_starts = {}
+        for term in terms:
+            offsets = [
+                i for i in range(1, len(term))
+                if term[i:] in term_prefixes or any(term[i:j] in term_set for j in range(i + 1, len(term)))
+            ]
+            if offsets:
+                self.inner_starts[term] = offsets
+        self.category_patterns = {
+            category: compile_trie_pattern(terms)
+            for category, terms in self.categories.items()
+        }
+
+    def count_terms(self, text):
+        """Return {term: count} for every term found in lowercase text"""
+        counts = {}
+        ends = {}
+        prefixes = self.prefixes
+        inner_starts = self.inner_starts
+        match_at = self.pattern.match
+
+        def credit(term, start):
+            for other in prefixes[term]:
+                if start >= ends.get(other, 0):
+                    counts[other] = counts.get(other, 0) + 1
+                    ends[other] = start + len(other)
+
+        for match in self.pattern.finditer(text):
+            term = match.group()
+            start = match.start()
+            credit(term, start)
+            # Terms starting inside this one; the scan itself resumes at its end
+            for offset in inner_starts.get(term, ()):
+                inner = match_at(text, start + offset)
+                if inner:
+                    credit(inner.group(), start + offset)
+        return counts
+
+    def match(self, text):
+        """Return {category: {term: count}} covering every category"""
+        counts = self.count_terms(text)
+        return {
+            category: {term: counts.get(term, 0) for term in terms}
+            for category, terms in self.categories.items()
+        }
+
+    def contains_any(self, text, category):
+        """Cheap early-exit check for one category"""
+        return self.category_patterns[category].search(text) is not None
+
+KEYWORD_MATCHER = KeywordMatcher(KEYWORD_CATEGORIES)
+
+PRICE_PATTERN = re.compile(r'\$\d+(?:\.\d{2})?')
+
+# Product container candidates, in order of preference
+PRODUCT_SELECTORS = [
+    '[data-testid*="product"]',
+    '[data-cy*="product"]',
+    '.product-tile',
+    '.product-card',
+    '.product-item',
+    'article',
+    '[class*="tile"]',
+    '[class*="card"]'
+]
+
+def match_product_selectors(tag):
+    """Return the PRODUCT_SELECTORS a single tag satisfies"""
+    classes = tag.get('class') or []
+    if isinstance(classes, str):
+        classes = classes.split()
+    class_text = ' '.join(classes)
+
+    matched = []
+    if 'product' in (tag.get('data-testid') or ''):
+        matched.append('[data-testid*="product"]')
+    if 'product' in (tag.get('data-cy') or ''):
+        matched.append('[data-cy*="product"]')
+    for name in ('product-tile', 'product-card', 'product-item'):
+        if name in classes:
+            matched.append(f'.{name}')
+    if tag.name == 'article':
+        matched.append('article')
+    if 'tile' in class_text:
+        matched.append('[class*="tile"]')
+    if 'card' in class_text:
+        matched.append('[class*="card"]')
+    return matched
+
+def analyze_html(html_content):
+    """Parse a page once and collect everything the analyzers need in one walk.
+
+    Returns a dict with visible text stats, keyword counts, prices, member
+    and blocking indicators and product-container candidate counts.
+    """
+    # bs4 is imported here so HTTP-only commands don't pay for it
+    from bs4 import BeautifulSoup, NavigableString, Comment
+
+    started = time.perf_counter()
+    soup = BeautifulSoup(html_content, HTML_PARSER)
+    parsed = time.perf_counter()
+
+    text_parts = []
+    prices = []
+    markers = []
+    selector_counts = dict.fromkeys(PRODUCT_SELECTORS, 0)
+
+    for node in soup.descendants:
+        if isinstance(node, NavigableString):
+            if isinstance(node, Comment):
+                continue
+            # Prices and blocking markers also show up inside scripts
+            prices.extend(PRICE_PATTERN.findall(node))
+            if node.parent is not None and node.parent.name in ('script', 'style', 'noscript', 'template'):
+                markers.append(node)
+            else:
+                text_parts.append(node)
+            continue
+
+        for selector in match_product_selectors(node):
+            selector_counts[selector] += 1
+        for attr in ('src', 'href', 'action'):
+            value = node.get(attr)
+            if isinstance(value, str):
+                markers.append(value)
+
+    page_text = ''.join(text_parts).lower()
+    marker_text = ' '.join(markers).lower()
+    walked = time.perf_counter()
+
+    matches = KEYWORD_MATCHER.match(page_text)
+    keyword_counts = matches['nappy']
+    matched = time.perf_counter()
+
+    return {
+        'text_length': len(page_text),
+        'keyword_counts': keyword_counts,
+        'nappy_keywords_count': sum(keyword_counts.values()),
+        'prices': prices,
+        'price_count': len(prices),
+        'member_only_indicators': [t for t, n in matches['member'].items() if n],
+        'member_hints': [t for t, n in matches['member_hint'].items() if n],
+        'blocking_indicators': [
+            t for t in KEYWORD_CATEGORIES['blocking']
+            if matches['blocking'][t] or t in marker_text
+        ],
+        'product_candidates': [
+            {'selector': selector, 'count': count}
+            for selector, count in selector_counts.items() if count
+        ],
+        # Seconds per phase, so callers in other processes can report them
+        'timings': {
+            'parse.soup': parsed - started,
+            'parse.walk': walked - parsed,
+            'parse.match': matched - walked
+        }
+    }
+
+def analyze_page_content(html_content, url, page=None):
     """Analyze page content for debugging"""
     analysis = {
         'nappy_keywords_count': 0,
@@ -212,47 +1242,12 @@ def analyze_page_content(html_content, url):
     }
     
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        page_text = soup.get_text().lower()
-        
-        # Count nappy keywords
-        nappy_keywords = ['napp', 'diaper', 'huggies', 'pampers', 'babylove', 'rascal', 'tooshies']
-        for keyword in nappy_keywords:
-            count = page_text.count(keyword.lower())
-            analysis['nappy_keywords_count'] += count
-        
-        # Count price patterns
-        prices = re.findall(r'\$\d+(?:\.\d{2})?', html_content)
-        analysis['price_count'] = len(prices)
-        
-        # Check for member-only indicators
-        member_indicators = [
-            'member price', 'member only', 'sign in to see', 'login to see',
-            'flybuys member', 'member special', 'exclusive member'
-        ]
-        
-        for indicator in member_indicators:
-            if indicator in page_text:
-                analysis['member_only_indicators'].append(indicator)
-        
-        # Identify potential product selectors
-        potential_selectors = [
-            '[data-testid*="product"]',
-            '[data-cy*="product"]', 
-            '.product-tile',
-            '.product-card',
-            '.product-item',
-            'article',
-            '[class*="tile"]'
-        ]
-        
-        for selector in potential_selectors:
-            elements = soup.select(selector)
-            if elements:
-                analysis['potential_product_selectors'].append({
-                    'selector': selector,
-                    'count': len(elements)
-                })
+        page = page or analyze_html(html_content)
+
+        analysis['nappy_keywords_count'] = page['nappy_keywords_count']
+        analysis['price_count'] = page['price_count']
+        analysis['member_only_indicators'] = page['member_only_indicators']
+        analysis['potential_product_selectors'] = page['product_candidates']
         
         # Determine page type
         if 'nappies' in url:
@@ -267,84 +1262,949 @@ def analyze_page_content(html_content, url):
     
     return analysis
 
-async def debug_compliant_crawl():
-    """Debug crawl4ai with only compliant URLs"""
+# Product record shared by every extraction tier
+ProductRecord = namedtuple('ProductRecord', [
+    'retailer', 'product_id', 'name', 'brand', 'size', 'count',
+    'price', 'was_price', 'is_special', 'url', 'source'
+])
+
+NEXT_DATA_PATTERN = re.compile(
+    r'<script[^>]*id=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', re.S | re.I
+)
+JSON_LD_PATTERN = re.compile(
+    r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.S | re.I
+)
+SIZE_TOKEN_PATTERN = re.compile(r'\b(?:size|sz)\s*\d+\+?', re.I)
+MULTIPACK_PATTERN = re.compile(r'\b(\d+)\s*[x×]\s*(\d+)\b', re.I)
+PACK_COUNT_PATTERN = re.compile(
+    r'\b(\d+)\s*(?:pack|pk|pce|pieces?|count|ct|ea)\b|\bpack\s+of\s+(\d+)\b', re.I
+)
+PACK_NOUN_PATTERN = re.compile(r'\b(\d+)\s*(?:nappies|nappy pants|nappy|pants)\b', re.I)
+NAPPY_SIZE_PATTERN = re.compile(
+    r'\b(?:size|sz)\s*(\d+\+?)|\b(newborn|infant|crawler|toddler|walker|junior)\b', re.I
+)
+
+def parse_pack_count(text):
+    """Number of nappies in a pack from a title like '... Size 4 | 50 pack'.
+
+    'Size N' is never a count, 'AxB' multipacks count A*B, and a number
+    next to pack/pk/ct wins over one next to 'nappies'.
+    """
+    text = SIZE_TOKEN_PATTERN.sub(' ', text or '')
+    match = MULTIPACK_PATTERN.search(text)
+    if match:
+        return int(match.group(1)) * int(match.group(2))
+    match = PACK_COUNT_PATTERN.search(text) or PACK_NOUN_PATTERN.search(text)
+    if not match:
+        return None
+    return int(next(group for group in match.groups() if group))
+
+def parse_nappy_size(text):
+    """Nappy size ('4', 'newborn', ...) from a product title"""
+    match = NAPPY_SIZE_PATTERN.search(text or '')
+    if not match:
+        return None
+    return (match.group(1) or match.group(2)).lower()
+
+def parse_price(value):
+    """Float price from 29, '29.00' or '$29.00'; None when unparseable"""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.search(r'\d+(?:\.\d+)?', str(value).replace(',', ''))
+    return float(match.group()) if match else None
+
+def product_slug(*parts):
+    return re.sub(r'[^a-z0-9]+', '-', ' '.join(p for p in parts if p).lower()).strip('-')
+
+def _product_from_next_data(node, page_url, retailer):
+    """Search/browse result: {name, brand, size, pricing: {now, was, ...}}"""
+    pricing = node['pricing']
+    price = parse_price(pricing.get('now'))
+    if price is None:
+        return None
+    was_price = parse_price(pricing.get('was')) or None
+    name = node.get('name') or ''
+    brand = node.get('brand') or ''
+    size = node.get('size') or ''
+    product_id = str(node['id']) if node.get('id') not in (None, '') else None
+    title = ' '.join(p for p in (brand, name, size) if p)
+    url = page_url
+    if product_id:
+        url = retailer.product_url(product_slug(brand, name, size), product_id)
+    return ProductRecord(
+        retailer=retailer.name,
+        product_id=product_id,
+        name=title,
+        brand=brand or None,
+        size=parse_nappy_size(title),
+        count=parse_pack_count(size) or parse_pack_count(title),
+        price=price,
+        was_price=was_price if was_price and was_price > price else None,
+        is_special=bool(
+            (was_price and was_price > price) or pricing.get('promotionType')
+            or pricing.get('specialType') or pricing.get('onlineSpecial')
+        ),
+        url=url,
+        source='next_data'
+    )
+
+def _product_from_json_ld(node, page_url, retailer):
+    """schema.org Product with offers.price"""
+    offers = node.get('offers') or {}
+    if isinstance(offers, list):
+        offers = offers[0] if offers else {}
+    price = parse_price(offers.get('price') or offers.get('lowPrice'))
+    if price is None:
+        return None
+    brand = node.get('brand')
+    if isinstance(brand, dict):
+        brand = brand.get('name')
+    name = node.get('name') or ''
+    return ProductRecord(
+        retailer=retailer.name,
+        product_id=str(node.get('sku') or node.get('productID') or '') or None,
+        name=name,
+        brand=brand or None,
+        size=parse_nappy_size(name),
+        count=parse_pack_count(name),
+        price=price,
+        was_price=None,
+        is_special=False,
+        url=node.get('url') or offers.get('url') or page_url,
+        source='json_ld'
+    )
+
+def iter_json_products(data, page_url, retailer):
+    """Walk a decoded JSON document and yield every product it describes"""
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+            continue
+        if not isinstance(node, dict):
+            continue
+
+        node_type = node.get('@type')
+        if node_type == 'Product' or (isinstance(node_type, list) and 'Product' in node_type):
+            record = _product_from_json_ld(node, page_url, retailer)
+            if record:
+                yield record
+            continue
+        if node.get('name') and isinstance(node.get('pricing'), dict):
+            record = _product_from_next_data(node, page_url, retailer)
+            if record:
+                yield record
+            continue
+
+        stack.extend(reversed(list(node.values())))
+
+def extract_embedded_products(html_content, page_url, retailer=None):
+    """Tier 1: products from __NEXT_DATA__ / JSON-LD blocks in plain HTML.
+
+    Only the script blocks are located (by regex) and decoded, so this costs
+    a fraction of a full HTML parse and needs no browser. Records are
+    attributed to `retailer`, by default the adapter for page_url's host;
+    raises ValueError when no adapter serves that host.
+    """
+    retailer = retailer or retailer_for_url(page_url)
+    if retailer is None:
+        raise ValueError(f"No retailer adapter registered for {page_url}")
+    blocks = NEXT_DATA_PATTERN.findall(html_content) + JSON_LD_PATTERN.findall(html_content)
+    products = []
+    seen = set()
+    for block in blocks:
+        try:
+            data = json.loads(block)
+        except ValueError:
+            continue
+        for record in iter_json_products(data, page_url, retailer):
+            key = record.product_id or record.name
+            if key not in seen:
+                seen.add(key)
+                products.append(record)
+    return products
+
+PRICE_DB_PATH = os.environ.get('DEAL_PRICE_DB', os.path.join('data', 'price_history.sqlite3'))
+DEALS_JSON_PATH = os.path.join('docs', 'latest_deals.json')
+FEED_DIR = os.path.join('docs', 'feed')
+FEED_FIELDS = [
+    'store', 'product', 'price_cents', 'was_cents', 'unit_centicents',
+    'drop_pct', 'flags', 'url', 'size', 'count', 'median_cents'
+]
+FEED_FLAG_SPECIAL = 1
+FEED_FLAG_NEW_LOW = 2
+FEED_VIEW_SIZE = 60
+LOCAL_TZ = ZoneInfo('Australia/Sydney')
+
+def product_key(record):
+    """Stable per-retailer key for a product"""
+    return record.product_id or product_slug(record.name)
+
+class PriceHistoryStore:
+    """SQLite price history: one row per product, retailer and day.
+
+    Observations are upserted in one batch per run, so re-running on the
+    same day is idempotent. The (product, retailer, date) primary key
+    serves every history query. Prices that failed evaluate_deals' checks
+    are kept with is_valid = 0 and left out of every query below.
+
+    The database itself is a rebuildable cache: dump() writes the history
+    as sorted CSV files next to it, which are committed, and an empty
+    database is reloaded from them on open.
+    """
+
+    PRODUCT_COLUMNS = ['retailer', 'product_key', 'name', 'brand', 'size', 'count', 'url']
+    PRICE_COLUMNS = ['retailer', 'product_key', 'observed_on', 'price', 'was_price', 'is_special', 'is_valid']
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS products (
+            retailer TEXT NOT NULL,
+            product_key TEXT NOT NULL,
+            name TEXT NOT NULL,
+            brand TEXT,
+            size TEXT,
+            count INTEGER,
+            url TEXT,
+            last_seen TEXT NOT NULL,
+            PRIMARY KEY (product_key, retailer)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS price_history (
+            product_key TEXT NOT NULL,
+            retailer TEXT NOT NULL,
+            observed_on TEXT NOT NULL,
+            price REAL NOT NULL,
+            was_price REAL,
+            is_special INTEGER NOT NULL DEFAULT 0,
+            is_valid INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (product_key, retailer, observed_on)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS price_history_by_day
+            ON price_history (observed_on, retailer);
+    """
+
+    def __init__(self, path=PRICE_DB_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(self.SCHEMA)
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(price_history)")}
+        if 'is_valid' not in columns:
+            with self.conn:
+                self.conn.execute(
+                    "ALTER TABLE price_history ADD COLUMN is_valid INTEGER NOT NULL DEFAULT 1"
+                )
+        directory = os.path.dirname(path) or '.'
+        self.products_dump = os.path.join(directory, 'products.csv')
+        self.prices_dump = os.path.join(directory, 'price_history.csv')
+        if self.conn.execute("SELECT 1 FROM price_history LIMIT 1").fetchone() is None:
+            self.load_dump()
+
+    def dump(self):
+        """Write products and prices as CSV, sorted so each run only appends"""
+        for path, columns, query in (
+            (self.products_dump, self.PRODUCT_COLUMNS,
+             "SELECT %s FROM products ORDER BY retailer, product_key"),
+            (self.prices_dump, self.PRICE_COLUMNS,
+             "SELECT %s FROM price_history ORDER BY observed_on, retailer, product_key"),
+        ):
+            tmp = path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f, lineterminator='\n')
+                writer.writerow(columns)
+                writer.writerows(self.conn.execute(query % ', '.join(columns)))
+            os.replace(tmp, path)
+        return self.prices_dump
+
+    def load_dump(self):
+        """Rebuild the tables from the CSV dump, if there is one"""
+        if not (os.path.exists(self.products_dump) and os.path.exists(self.prices_dump)):
+            return 0
+
+        def nullable(value, convert):
+            return convert(value) if value != '' else None
+
+        with open(self.prices_dump, encoding='utf-8', newline='') as f:
+            prices = [
+                (row['product_key'], row['retailer'], row['observed_on'], float(row['price']),
+                 nullable(row['was_price'], float), int(row['is_special']), int(row['is_valid']))
+                for row in csv.DictReader(f)
+            ]
+        last_seen = {}
+        for key, retailer, observed_on, *_ in prices:
+            last_seen[(key, retailer)] = max(observed_on, last_seen.get((key, retailer), observed_on))
+        with open(self.products_dump, encoding='utf-8', newline='') as f:
+            products = [
+                (row['retailer'], row['product_key'], row['name'], row['brand'] or None,
+                 row['size'] or None, nullable(row['count'], int), row['url'] or None,
+                 last_seen.get((row['product_key'], row['retailer']), ''))
+                for row in csv.DictReader(f)
+            ]
+
+        with self.conn:
+            self.conn.executemany("""
+                INSERT OR REPLACE INTO products (retailer, product_key, name, brand, size, count, url, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, products)
+            self.conn.executemany("""
+                INSERT OR REPLACE INTO price_history (product_key, retailer, observed_on, price, was_price,
+                                                      is_special, is_valid)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, prices)
+        print(f"  🗄️ Rebuilt {self.path} from {self.prices_dump} ({len(prices)} prices)")
+        return len(prices)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record_products(self, records, observed_on=None, invalid_keys=()):
+        """Upsert one run's ProductRecords in a single transaction.
+
+        Records whose (product_key, retailer) is in invalid_keys are stored
+        flagged invalid; a valid price for the same day always wins.
+        """
+        observed_on = observed_on or datetime.now(LOCAL_TZ).date().isoformat()
+        product_rows = []
+        price_rows = []
+        for record in records:
+            key = product_key(record)
+            product_rows.append((
+                record.retailer, key, record.name, record.brand, record.size,
+                record.count, record.url, observed_on
+            ))
+            price_rows.append((
+                key, record.retailer, observed_on, record.price,
+                record.was_price, int(bool(record.is_special)),
+                int((key, record.retailer) not in invalid_keys)
+            ))
+
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO products (retailer, product_key, name, brand, size, count, url, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (product_key, retailer) DO UPDATE SET
+                    name = excluded.name, brand = excluded.brand, size = excluded.size,
+                    count = excluded.count, url = excluded.url, last_seen = excluded.last_seen
+            """, product_rows)
+            self.conn.executemany("""
+                INSERT INTO price_history (product_key, retailer, observed_on, price, was_price,
+                                           is_special, is_valid)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (product_key, retailer, observed_on) DO UPDATE SET
+                    price = CASE
+                        WHEN excluded.is_valid > is_valid THEN excluded.price
+                        WHEN excluded.is_valid < is_valid THEN price
+                        ELSE MIN(price, excluded.price) END,
+                    was_price = CASE WHEN excluded.is_valid < is_valid THEN was_price ELSE excluded.was_price END,
+                    is_special = CASE
+                        WHEN excluded.is_valid > is_valid THEN excluded.is_special
+                        WHEN excluded.is_valid < is_valid THEN is_special
+                        ELSE MAX(is_special, excluded.is_special) END,
+                    is_valid = MAX(is_valid, excluded.is_valid)
+            """, price_rows)
+        return len(price_rows)
+
+    def rolling_stats(self, days=90, until=None):
+        """{(product_key, retailer): {'min', 'median', 'observations'}} over a window"""
+        until = until or datetime.now(LOCAL_TZ).date()
+        since = (until - timedelta(days=days)).isoformat()
+        rows = self.conn.execute("""
+            WITH recent AS (
+                SELECT product_key, retailer, price,
+                       ROW_NUMBER() OVER (PARTITION BY product_key, retailer ORDER BY price) AS rn,
+                       COUNT(*) OVER (PARTITION BY product_key, retailer) AS n
+                FROM price_history
+                WHERE observed_on > ? AND observed_on <= ? AND is_valid = 1
+            )
+            SELECT product_key, retailer, MIN(price) AS min_price,
+                   AVG(CASE WHEN rn IN ((n + 1) / 2, (n + 2) / 2) THEN price END) AS median_price,
+                   MAX(n) AS observations
+            FROM recent
+            GROUP BY product_key, retailer
+        """, (since, until.isoformat())).fetchall()
+        return {
+            (row['product_key'], row['retailer']): {
+                'min': row['min_price'],
+                'median': row['median_price'],
+                'observations': row['observations']
+            }
+            for row in rows
+        }
+
+    def prior_stats(self, days=90):
+        """rolling_stats up to yesterday, so today's price isn't its own baseline"""
+        return self.rolling_stats(days, until=datetime.now(LOCAL_TZ).date() - timedelta(days=1))
+
+    def todays_prices(self, observed_on=None, max_age_days=0):
+        """Joined product and price rows for one day.
+
+        With max_age_days each product's latest observation in that window
+        stands in for today's, so pages the incremental crawl skipped as
+        unchanged keep their current price.
+        """
+        observed_on = observed_on or datetime.now(LOCAL_TZ).date().isoformat()
+        since = (datetime.fromisoformat(observed_on).date() - timedelta(days=max_age_days)).isoformat()
+        return self.conn.execute("""
+            SELECT p.*, h.price, h.was_price, h.is_special, h.observed_on
+            FROM (
+                SELECT *, ROW_NUMBER() OVER (
+                    PARTITION BY product_key, retailer ORDER BY observed_on DESC
+                ) AS position
+                FROM price_history
+                WHERE observed_on BETWEEN ? AND ? AND is_valid = 1
+            ) h
+            JOIN products p USING (product_key, retailer)
+            WHERE h.position = 1
+            ORDER BY h.price
+        """, (since, observed_on)).fetchall()
+
+    def new_lows(self, days=90, observed_on=None):
+        """Today's rows priced below every earlier observation in the window"""
+        observed_on = observed_on or datetime.now(LOCAL_TZ).date().isoformat()
+        since = (datetime.fromisoformat(observed_on).date() - timedelta(days=days)).isoformat()
+        return self.conn.execute("""
+            SELECT p.*, h.price, prior.min_price AS previous_low
+            FROM price_history h
+            JOIN products p USING (product_key, retailer)
+            JOIN (
+                SELECT product_key, retailer, MIN(price) AS min_price
+                FROM price_history
+                WHERE observed_on > ? AND observed_on < ? AND is_valid = 1
+                GROUP BY product_key, retailer
+            ) prior USING (product_key, retailer)
+            WHERE h.observed_on = ? AND h.is_valid = 1 AND h.price < prior.min_price
+        """, (since, observed_on, observed_on)).fetchall()
+
+    def export_latest_deals(self, path=DEALS_JSON_PATH, days=90, max_age_days=0, retailers=None):
+        """Write today's specials and new lows to latest_deals.json.
+
+        The file is only rewritten when the deal list changes, so unchanged
+        days produce no diff. `retailers` names the crawled retailers
+        (every registered one by default).
+        """
+        retailers = retailers or [retailer.name for retailer in get_retailers()]
+        now = datetime.now(LOCAL_TZ)
+        stats = self.rolling_stats(days)
+        new_low_keys = {(row['product_key'], row['retailer']) for row in self.new_lows(days)}
+
+        deals = []
+        for row in self.todays_prices(max_age_days=max_age_days):
+            key = (row['product_key'], row['retailer'])
+            if not (row['is_special'] or key in new_low_keys):
+                continue
+            history = stats.get(key, {})
+            labels = []
+            if row['was_price']:
+                labels.append(f"Was ${row['was_price']:.2f}")
+            elif row['is_special']:
+                labels.append("Special")
+            if key in new_low_keys:
+                labels.append(f"Lowest in {days} days")
+            deals.append({
+                'store': row['retailer'],
+                'product': row['name'],
+                'price': f"${row['price']:.2f}",
+                'special': ' · '.join(labels),
+                'url': row['url'],
+                'median_price': round(history['median'], 2) if history.get('median') else None
+            })
+
+        try:
+            with open(path, encoding='utf-8') as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = {}
+        if previous.get('deals') == deals:
+            print(f"  📝 {path} unchanged ({len(deals)} deals)")
+            return deals
+
+        payload = {
+            'date': now.replace(tzinfo=None).isoformat(),
+            'total_deals': len(deals),
+            'deals': deals,
+            'last_check': now.strftime('%Y-%m-%d %H:%M:%S AEST'),
+            'method': f"{' + '.join(retailers)}-only robots.txt compliant scraping + official sitemaps"
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+        print(f"  📝 Wrote {len(deals)} deals to {path}")
+        return deals
+
+    def export_deal_feed(self, directory=FEED_DIR, days=90, max_age_days=0, retailers=None):
+        """Write the dashboard feed: a small index, per-retailer shards and
+        precomputed views (biggest drop, best price per nappy).
+
+        Every tracked product is ranked by evaluate_deals against its
+        rolling history. Rows are arrays in FEED_FIELDS order with prices in
+        integer cents, and every file except index.json is named by a hash
+        of its content, so unchanged shards keep their name (and browser
+        cache) and produce no diff. Files the new index no longer lists are
+        removed. `retailers` names the crawled retailers (every registered
+        one by default).
+        """
+        retailers = retailers or [retailer.name for retailer in get_retailers()]
+        now = datetime.now(LOCAL_TZ)
+        new_low_keys = {(row['product_key'], row['retailer']) for row in self.new_lows(days)}
+        records = [
+            ProductRecord(
+                retailer=row['retailer'], product_id=row['product_key'], name=row['name'],
+                brand=row['brand'], size=row['size'], count=row['count'], price=row['price'],
+                was_price=row['was_price'], is_special=bool(row['is_special']), url=row['url'],
+                source='history'
+            )
+            for row in self.todays_prices(max_age_days=max_age_days)
+        ]
+        table = evaluate_deals(records, self.prior_stats(days))
+
+        stores = sorted({deal['record'].retailer for deal in table} | set(retailers))
+        rows = []
+        for deal in table:
+            record = deal['record']
+            flags = FEED_FLAG_SPECIAL if record.is_special else 0
+            if (product_key(record), record.retailer) in new_low_keys:
+                flags |= FEED_FLAG_NEW_LOW
+            rows.append([
+                stores.index(record.retailer),
+                record.name,
+                round(record.price * 100),
+                round(record.was_price * 100) if record.was_price else None,
+                round(deal['unit_price'] * 10000) if deal['unit_price'] else None,
+                round(deal['score']),
+                flags,
+                record.url,
+                record.size,
+                record.count,
+                round(deal['median_price'] * 100) if deal['median_price'] else None
+            ])
+
+        os.makedirs(directory, exist_ok=True)
+        written = set()
+
+        def write_file(prefix, file_rows):
+            body = json.dumps(file_rows, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+            name = f"{prefix}-{hashlib.sha256(body).hexdigest()[:10]}.json"
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):
+                with open(path, 'wb') as f:
+                    f.write(body)
+            written.add(name)
+            return {'file': name, 'count': len(file_rows)}
+
+        # Rows arrive ranked best deal first, so shards and the drop view keep that order
+        shards = {
+            store: write_file(product_slug(store), [row for row in rows if row[0] == i])
+            for i, store in enumerate(stores)
+        }
+        unit_ranked = sorted((row for row in rows if row[4] is not None), key=lambda row: row[4])
+        views = {
+            'biggest_drop': write_file('biggest-drop', [row for row in rows if row[5] > 0][:FEED_VIEW_SIZE]),
+            'best_unit_price': write_file('best-unit-price', unit_ranked[:FEED_VIEW_SIZE])
+        }
+
+        index = {
+            'version': 1,
+            'fields': FEED_FIELDS,
+            'stores': stores,
+            'shards': shards,
+            'views': views,
+            'total_products': len(rows),
+            'total_deals': sum(1 for row in rows if row[6])
+        }
+        index_path = os.path.join(directory, 'index.json')
+        try:
+            with open(index_path, encoding='utf-8') as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = {}
+        if {k: v for k, v in previous.items() if k not in ('date', 'last_check', 'method')} != index:
+            index.update(
+                date=now.replace(tzinfo=None).isoformat(),
+                last_check=now.strftime('%Y-%m-%d %H:%M:%S AEST'),
+                method=f"{' + '.join(retailers)}-only robots.txt compliant scraping + official sitemaps"
+            )
+            with open(index_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f, indent=1)
+            print(f"  🗂️ Wrote feed index with {len(rows)} products in {len(shards)} shards to {directory}")
+        else:
+            print(f"  🗂️ Feed in {directory} unchanged ({len(rows)} products)")
+
+        for name in os.listdir(directory):
+            if name.endswith('.json') and name != 'index.json' and name not in written:
+                os.unlink(os.path.join(directory, name))
+        return index
+
+SNAPSHOT_DIR = os.environ.get('DEAL_SNAPSHOT_DIR', 'snapshots')
+SNAPSHOT_RETENTION_DAYS = int(os.environ.get('DEAL_SNAPSHOT_DAYS', '30'))
+SNAPSHOT_KEEP_PER_URL = 3
+
+class SnapshotStore:
+    """Content-addressed, compressed store of crawled HTML.
+
+    Each distinct page body is written once, compressed (zstd when the
+    zstandard package is installed, gzip otherwise), under
+    objects/<hash[:2]>/<sha256>. A SQLite index maps (url, captured_at) to
+    the hash, so re-crawling an unchanged page only adds an index row.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS snapshots (
+            url TEXT NOT NULL,
+            captured_at TEXT NOT NULL,
+            hash TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            PRIMARY KEY (url, captured_at)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS snapshots_by_time ON snapshots (captured_at);
+    """
+
+    def __init__(self, directory=SNAPSHOT_DIR):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, 'objects')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(directory, 'index.sqlite3'))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(self.SCHEMA)
+        self.zstd = None
+        if importlib.util.find_spec('zstandard'):
+            import zstandard
+            self.zstd = zstandard
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _object_path(self, digest, ext):
+        return os.path.join(self.objects_dir, digest[:2], digest + ext)
+
+    def _find_object(self, digest):
+        for ext in ('.zst', '.gz'):
+            path = self._object_path(digest, ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put(self, url, html, captured_at=None):
+        """Snapshot one page; returns (hash, True if the content is new)"""
+        body = html.encode('utf-8') if isinstance(html, str) else html
+        digest = hashlib.sha256(body).hexdigest()
+        captured_at = captured_at or datetime.now(LOCAL_TZ).replace(tzinfo=None).isoformat(timespec='seconds')
+
+        is_new = self._find_object(digest) is None
+        if is_new:
+            path = self._object_path(digest, '.zst' if self.zstd else '.gz')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = tempfile.NamedTemporaryFile(dir=os.path.dirname(path), prefix='.tmp-', delete=False)
+            with tmp:
+                if self.zstd:
+                    tmp.write(self.zstd.ZstdCompressor(level=10).compress(body))
+                else:
+                    with gzip.GzipFile(fileobj=tmp, mode='wb', compresslevel=9, mtime=0) as gz:
+                        gz.write(body)
+            os.replace(tmp.name, path)
+            METRICS.incr('snapshot.bytes', os.path.getsize(path))
+
+        with self.conn:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO snapshots (url, captured_at, hash, size)
+                VALUES (?, ?, ?, ?)
+            """, (url, captured_at, digest, len(body)))
+        return digest, is_new
+
+    def open(self, digest):
+        """Binary file object streaming the decompressed page"""
+        path = self._find_object(digest)
+        if path is None:
+            raise KeyError(digest)
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rb')
+        if not self.zstd:
+            raise RuntimeError(f"zstandard is required to read {path}")
+        return self.zstd.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+
+    def read_text(self, digest):
+        with self.open(digest) as f:
+            return f.read().decode('utf-8', errors='replace')
+
+    def history(self, url=None, since=None):
+        """Index rows (url, captured_at, hash, size), oldest first"""
+        query = "SELECT url, captured_at, hash, size FROM snapshots WHERE 1 = 1"
+        params = []
+        if url:
+            query += " AND url = ?"
+            params.append(url)
+        if since:
+            query += " AND captured_at >= ?"
+            params.append(since)
+        return self.conn.execute(query + " ORDER BY captured_at, url", params).fetchall()
+
+    def latest(self):
+        """Most recent snapshot row for every URL"""
+        return self.conn.execute("""
+            SELECT url, MAX(captured_at) AS captured_at, hash, size
+            FROM snapshots GROUP BY url ORDER BY url
+        """).fetchall()
+
+    def prune(self, days=SNAPSHOT_RETENTION_DAYS, keep_per_url=SNAPSHOT_KEEP_PER_URL):
+        """Drop index rows older than `days`, always keeping the newest
+        `keep_per_url` per URL, then delete objects nothing refers to.
+
+        Returns (rows removed, objects removed).
+        """
+        cutoff = (datetime.now(LOCAL_TZ) - timedelta(days=days)).replace(tzinfo=None).isoformat()
+        with self.conn:
+            rows = self.conn.execute("""
+                DELETE FROM snapshots WHERE (url, captured_at) IN (
+                    SELECT url, captured_at FROM (
+                        SELECT url, captured_at, ROW_NUMBER() OVER (
+                            PARTITION BY url ORDER BY captured_at DESC
+                        ) AS position
+                        FROM snapshots
+                    )
+                    WHERE position > ? AND captured_at < ?
+                )
+            """, (keep_per_url, cutoff)).rowcount
+
+        referenced = {row[0] for row in self.conn.execute("SELECT DISTINCT hash FROM snapshots")}
+        objects = 0
+        for root, _, files in os.walk(self.objects_dir):
+            for name in files:
+                digest = name.split('.')[0]
+                if digest not in referenced:
+                    os.unlink(os.path.join(root, name))
+                    objects += 1
+        return rows, objects
+
+_snapshot_store = None
+
+def get_snapshot_store():
+    """Shared SnapshotStore for the run; closed at exit"""
+    global _snapshot_store
+    if _snapshot_store is None:
+        _snapshot_store = SnapshotStore()
+        atexit.register(_snapshot_store.close)
+    return _snapshot_store
+
+RENDER_CONCURRENCY = int(os.environ.get('DEAL_RENDER_CONCURRENCY', '3'))
+RENDER_MAX_WAIT_MS = 10000
+
+# CSS for product tiles and price nodes on rendered listing pages
+PRODUCT_TILE_CSS = '[data-testid*="product"], .product-tile, .product-card, .product-item, article'
+PRICE_NODE_CSS = '[data-testid*="price"], [class*="price"]'
+
+# Polled by crawl4ai until it returns true: waits for tiles and prices, then
+# scrolls on each poll until the tile count has held for two rounds (or the
+# page has had RENDER_MAX_WAIT_MS). Progress lives on window between polls.
+RENDER_WAIT_FOR = """js:() => {
+    const now = performance.now();
+    if (now > %d) return true;
+    const tiles = document.querySelectorAll('%s').length;
+    if (tiles === 0 || document.querySelectorAll('%s').length === 0) return false;
+    const state = window.__dealScroll || (window.__dealScroll = {last: -1, stable: 0, at: 0});
+    if (now - state.at < 400) return false;
+    state.stable = tiles === state.last ? state.stable + 1 : 0;
+    state.last = tiles;
+    state.at = now;
+    window.scrollTo(0, document.body.scrollHeight);
+    return state.stable >= 2;
+}""" % (RENDER_MAX_WAIT_MS, PRODUCT_TILE_CSS, PRICE_NODE_CSS)
+
+async def render_page(crawler, url, pool):
+    """Render one URL in a browser tab from the bounded pool"""
+    async with pool, get_request_scheduler().slot(url):
+        started = time.monotonic()
+        result = await crawler.arun(
+            url=url,
+            word_count_threshold=10,
+            bypass_cache=True,
+            # Adaptive waits - return as soon as products stop loading
+            wait_for=RENDER_WAIT_FOR,
+            delay_before_return_html=0.2,
+            # Respectful headers
+            headers={
+                'User-Agent': BOT_USER_AGENT,
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'en-AU,en;q=0.5',
+                'DNT': '1'
+            }
+        )
+        elapsed = time.monotonic() - started
+        METRICS.record('render', elapsed)
+        METRICS.incr('render.bytes', len(result.html or ''))
+        return result, elapsed
+
+def parse_rendered_page(url, html_content, retailer=None):
+    """Blocking check, crawl analysis and products for one rendered page.
+
+    Runs in the parse pool, so the multi-MB rendered HTML is never parsed
+    on the event loop; returns no raw HTML.
+    """
+    page = analyze_html(html_content)
+    parsed = {
+        'url': url,
+        'blocking_indicators': page['blocking_indicators'],
+        'analysis': None,
+        'products': []
+    }
+    if page['blocking_indicators']:
+        return parsed
+    retailer = retailer or retailer_for_url(url)
+    parsed['analysis'] = analyze_crawled_content(html_content, url, page)
+    parsed['products'] = retailer.extract_products(html_content, url) if retailer else []
+    return parsed
+
+def report_crawled_page(url, result, elapsed, parsed):
+    """Print the analysis of one rendered page and save it for inspection.
+
+    `parsed` comes from parse_rendered_page. Returns False when the page
+    looks blocked.
+    """
+    print(f"\n  🎯 Compliant crawl: {url}")
+    print(f"    ⏱️ Rendered in {elapsed:.1f}s")
+    print(f"    📄 Content length: {len(result.html)}")
+    print(f"    🔗 Links found: {len(result.links) if hasattr(result, 'links') and result.links else 0}")
+
+    # Check for blocking
+    for indicator in parsed['blocking_indicators']:
+        print(f"    🚫 BLOCKING DETECTED: {indicator}")
+    if parsed['blocking_indicators']:
+        return False
+
+    print("    ✅ No blocking detected")
+
+    # Analyze what we got
+    analysis = parsed['analysis']
+
+    print(f"    🍼 Nappy content found: {analysis['has_nappy_content']}")
+    print(f"    💰 Prices found: {analysis['price_count']}")
+    print(f"    📦 Potential products: {analysis['product_elements']}")
+
+    # Snapshot for inspection and replay; unchanged pages are stored once
+    digest, is_new = get_snapshot_store().put(url, result.html)
+    print(f"    💾 Snapshot {digest[:12]} ({'new content' if is_new else 'unchanged'})")
+    return True
+
+async def debug_compliant_crawl(urls=None, max_pages=2, concurrency=RENDER_CONCURRENCY,
+                                parse_pool=None, parse_inline=False):
+    """Debug crawl4ai with only compliant URLs.
+
+    Pages render concurrently in up to `concurrency` tabs of one browser,
+    so wall-clock time follows the slowest page rather than the page count.
+    Rendered HTML is spooled to `parse_pool` (a pool of its own, started
+    before the browser, if none is given) so parsing never stalls the other
+    tabs; parse_inline=True parses on the event-loop thread instead.
+    Returns {url: parse_rendered_page result} for pages that rendered
+    without blocking.
+    """
     print("\n🕷️ DEBUGGING COMPLIANT CRAWLING")
     print("=" * 50)
     
-    # Only use confirmed allowed URLs
-    allowed_urls = check_robots_txt_compliance()
+    # Only use confirmed allowed URLs; render_page itself never checks.
+    # By default up to max_pages of them from every registered retailer
+    if urls is None:
+        urls = [
+            url for retailer in get_retailers()
+            for url in check_robots_txt_compliance(retailer)[:max_pages]
+        ]
+        max_pages = len(urls)
+    allowed_urls = [
+        url for url in urls
+        if get_robots_policy(url_origin(url)).can_fetch(url)
+    ]
     
     if not allowed_urls:
         print("  ❌ No allowed URLs found!")
-        return
+        return {}
     
+    urls = allowed_urls[:max_pages]
+    pool = asyncio.Semaphore(max(1, concurrency))
+    rendered = {}
+
+    crawler_class = load_crawl4ai()
+    if crawler_class is None:
+        return rendered
+
+    owns_pool = parse_pool is None and not parse_inline
+    if owns_pool:
+        parse_pool = ParsePool(min(PARSE_WORKERS, len(urls)))
+
+    async def parse(url, html):
+        if parse_inline:
+            return parse_rendered_page(url, html)
+        path = await asyncio.to_thread(spool_body, html)
+        return await parse_pool.parse_rendered(url, path=path)
+
+    async def render(url):
+        try:
+            result, elapsed = await render_page(crawler, url, pool)
+        except Exception as e:
+            return url, e, None
+        try:
+            return url, (result, elapsed), await parse(url, result.html)
+        except Exception as e:
+            return url, (result, elapsed), e
+
     try:
-        async with AsyncWebCrawler(verbose=True) as crawler:
-            
-            for url in allowed_urls[:2]:  # Test first 2 allowed URLs
-                print(f"\n  🎯 Testing compliant crawl: {url}")
-                
+        async with crawler_class(verbose=True) as crawler:
+            print(f"  🧭 Rendering {len(urls)} pages with {concurrency} tabs...")
+            started = time.monotonic()
+
+            # Report each page as soon as it has rendered and been parsed
+            for finished in asyncio.as_completed([render(url) for url in urls]):
+                url, outcome, parsed = await finished
+                if isinstance(outcome, Exception):
+                    print(f"\n  🎯 Compliant crawl: {url}")
+                    print(f"    ❌ Crawl error: {outcome}")
+                    continue
                 try:
-                    result = await crawler.arun(
-                        url=url,
-                        word_count_threshold=10,
-                        bypass_cache=True,
-                        # Conservative crawling - respect the site
-                        js_code=[
-                            "await new Promise(resolve => setTimeout(resolve, 2000));",
-                            "window.scrollTo(0, document.body.scrollHeight/3);",
-                            "await new Promise(resolve => setTimeout(resolve, 2000));",
-                            "window.scrollTo(0, document.body.scrollHeight/2);",
-                            "await new Promise(resolve => setTimeout(resolve, 2000));"
-                        ],
-                        wait_for="body",
-                        delay_before_return_html=4,
-                        # Respectful headers
-                        headers={
-                            'User-Agent': 'Mozilla/5.0 (compatible; diaper-deals-tracker/1.0; +https://github.com/pkamat25/diaper-deals-tracker)',
-                            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                            'Accept-Language': 'en-AU,en;q=0.5',
-                            'DNT': '1'
-                        }
-                    )
-                    
-                    print(f"    📄 Content length: {len(result.html)}")
-                    print(f"    🔗 Links found: {len(result.links) if hasattr(result, 'links') and result.links else 0}")
-                    
-                    # Check for blocking
-                    blocking_indicators = ['incapsula', 'blocked', 'access denied', 'captcha', 'cloudflare']
-                    html_lower = result.html.lower()
-                    
-                    blocked = False
-                    for indicator in blocking_indicators:
-                        if indicator in html_lower:
-                            print(f"    🚫 BLOCKING DETECTED: {indicator}")
-                            blocked = True
-                    
-                    if not blocked:
-                        print("    ✅ No blocking detected")
-                        
-                        # Analyze what we got
-                        analysis = analyze_crawled_content(result.html, url)
-                        
-                        print(f"    🍼 Nappy content found: {analysis['has_nappy_content']}")
-                        print(f"    💰 Prices found: {analysis['price_count']}")
-                        print(f"    📦 Potential products: {analysis['product_elements']}")
-                        
-                        # Save sample for manual inspection
-                        debug_filename = f"debug_compliant_{url.split('/')[-1]}_{datetime.now().strftime('%H%M%S')}.html"
-                        with open(debug_filename, 'w', encoding='utf-8') as f:
-                            f.write(result.html)
-                        print(f"    💾 Saved to {debug_filename}")
-                    
+                    if isinstance(parsed, Exception):
+                        raise parsed
+                    if report_crawled_page(url, *outcome, parsed):
+                        rendered[url] = parsed
                 except Exception as e:
-                    print(f"    ❌ Crawl error: {e}")
-        
+                    print(f"    ❌ Analysis error: {e}")
+
+            print(f"\n  ⏱️ Rendered {len(urls)} pages in {time.monotonic() - started:.1f}s")
+
     except Exception as e:
         print(f"  ❌ Crawler setup error: {e}")
+    finally:
+        if owns_pool:
+            parse_pool.close()
+
+    if rendered:
+        rows, objects = get_snapshot_store().prune()
+        if rows or objects:
+            print(f"  🧹 Pruned {rows} old snapshots ({objects} files)")
+
+    return rendered
+
+async def render_products(urls, parse_pool=None, parse_inline=False):
+    """Tier 2: render pages with crawl4ai and read products from the result.
 
-def analyze_crawled_content(html_content, url):
+    Only used for pages whose plain HTML had no embedded product JSON.
+    Returns {url: [ProductRecord]} for pages that rendered.
+    """
+    rendered = await debug_compliant_crawl(
+        urls=urls, max_pages=len(urls), parse_pool=parse_pool, parse_inline=parse_inline
+    )
+    return {url: parsed['products'] for url, parsed in rendered.items()}
+
+def analyze_crawled_content(html_content, url, page=None):
     """Analyze crawled content specifically for debugging"""
     analysis = {
         'has_nappy_content': False,
@@ -355,34 +2215,18 @@ def analyze_crawled_content(html_content, url):
     }
     
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
+        page = page or analyze_html(html_content)
+
         # Check for nappy content
-        nappy_keywords = ['napp', 'huggies', 'pampers', 'babylove']
-        page_text = soup.get_text().lower()
-        
-        if any(keyword in page_text for keyword in nappy_keywords):
-            analysis['has_nappy_content'] = True
-        
-        # Count prices
-        prices = re.findall(r'\$\d+(?:\.\d{2})?', html_content)
-        analysis['price_count'] = len(prices)
-        
-        # Count potential product elements
-        product_selectors = [
-            '[data-testid*="product"]', '.product-tile', '.product-card', 
-            'article', '[class*="tile"]', '[class*="card"]'
-        ]
-        
-        for selector in product_selectors:
-            elements = soup.select(selector)
-            if elements:
-                analysis['product_elements'] += len(elements)
-                break
+        analysis['has_nappy_content'] = page['nappy_keywords_count'] > 0
+        analysis['price_count'] = page['price_count']
+
+        # Count elements for the most specific product selector that matched
+        if page['product_candidates']:
+            analysis['product_elements'] = page['product_candidates'][0]['count']
         
         # Check for member-only pricing
-        member_indicators = ['member price', 'sign in', 'login', 'flybuys']
-        if any(indicator in page_text for indicator in member_indicators):
+        if page['member_hints']:
             analysis['member_only_detected'] = True
             analysis['recommendations'].append("Prices may only be visible to logged-in members")
         
@@ -401,36 +2245,688 @@ def analyze_crawled_content(html_content, url):
     
     return analysis
 
-def is_valid_nappy_price(price_str):
-    """Check if a price is realistic for nappies (between $5 and $100)"""
+NAPPY_PRICE_BOUNDS = (5.0, 100.0)      # Realistic pack price
+NAPPY_UNIT_PRICE_BOUNDS = (0.05, 2.0)  # Realistic price per nappy
+NAPPY_PACK_BOUNDS = (1, 400)
+
+def evaluate_deals(records, history=None, include_invalid=False):
+    """Batch-evaluate a run's ProductRecords as NumPy arrays.
+
+    Pack counts and sizes missing from a record are parsed from its title.
+    Unit prices, discounts against the was-price and against the rolling
+    median in `history` (PriceHistoryStore.rolling_stats), and the validity
+    bounds are then computed over all products at once. Returns a deal
+    table of the valid products, best first: by the larger discount, then
+    by price per nappy. With include_invalid, rejected products follow the
+    ranked ones so they can still be recorded in history.
+    """
+    import numpy as np
+
+    records = [
+        record if record.count and record.size else record._replace(
+            count=record.count or parse_pack_count(record.name),
+            size=record.size or parse_nappy_size(record.name)
+        )
+        for record in records
+    ]
+    if not records:
+        return []
+    history = history or {}
+    medians = [history.get((product_key(r), r.retailer), {}).get('median') for r in records]
+
+    # None becomes NaN, which every comparison below treats as "unknown"
+    price = np.array([r.price for r in records], dtype=float)
+    was_price = np.array([r.was_price for r in records], dtype=float)
+    count = np.array([r.count or None for r in records], dtype=float)
+    median = np.array(medians, dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        unit_price = price / count
+        discount = np.where(was_price > price, (was_price - price) / was_price * 100, 0.0)
+        history_discount = np.where(median > 0, (median - price) / median * 100, np.nan)
+
+    has_count = ~np.isnan(count)
+    valid = (price >= NAPPY_PRICE_BOUNDS[0]) & (price <= NAPPY_PRICE_BOUNDS[1])
+    valid &= ~has_count | (
+        (count >= NAPPY_PACK_BOUNDS[0]) & (count <= NAPPY_PACK_BOUNDS[1])
+        & (unit_price >= NAPPY_UNIT_PRICE_BOUNDS[0]) & (unit_price <= NAPPY_UNIT_PRICE_BOUNDS[1])
+    )
+
+    score = np.fmax(discount, history_discount)
+    order = np.lexsort((np.where(has_count, unit_price, np.inf), -score))
+    if not include_invalid:
+        order = order[valid[order]]
+    else:
+        order = np.concatenate((order[valid[order]], order[~valid[order]]))
+
+    return [
+        {
+            'record': records[i],
+            'valid': bool(valid[i]),
+            'unit_price': round(float(unit_price[i]), 4) if has_count[i] else None,
+            'discount_pct': round(float(discount[i]), 1),
+            'history_discount_pct': None if np.isnan(history_discount[i]) else round(float(history_discount[i]), 1),
+            'median_price': medians[i],
+            'score': round(float(score[i]), 1)
+        }
+        for i in order
+    ]
+
+SITEMAP_INDEX_PATH = os.environ.get('DEAL_SITEMAP_INDEX', os.path.join('.crawl_state', 'sitemap_urls.sqlite3'))
+RECRAWL_DAYS = int(os.environ.get('DEAL_RECRAWL_DAYS', '7'))
+SITEMAP_FORGET_DAYS = 30
+SITEMAP_BATCH_SIZE = 500
+
+class SitemapUrlIndex:
+    """Persisted index of sitemap URLs with their lastmod and classification.
+
+    Discovery merges the URLs it streams from the sitemaps in batches and
+    gets back only the nappy URLs worth fetching: new ones, ones whose
+    lastmod moved since they were last crawled, and ones not crawled for
+    recrawl_days (lastmod is optional and often stale). URLs are classified
+    once, when first seen.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sitemap_urls (
+            url TEXT PRIMARY KEY,
+            lastmod TEXT,
+            is_nappy INTEGER NOT NULL,
+            first_seen TEXT NOT NULL,
+            last_seen TEXT NOT NULL,
+            crawled_lastmod TEXT,
+            crawled_on TEXT
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path=SITEMAP_INDEX_PATH, recrawl_days=RECRAWL_DAYS):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        # Discovery threads share the connection; the lock serialises them
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+        today = datetime.now(LOCAL_TZ).date()
+        self.today = today.isoformat()
+        self.recrawl_before = (today - timedelta(days=recrawl_days)).isoformat()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def merge(self, entries, classify=None):
+        """Upsert a batch of (url, lastmod) pairs.
+
+        New URLs are classified with classify(url), by default a nappy
+        keyword match. Returns (nappy URL count, new URL count, nappy URLs
+        due for a crawl).
+        """
+        classify = classify or (lambda url: KEYWORD_MATCHER.contains_any(url.lower(), 'nappy'))
+        entries = dict(entries)
+        if not entries:
+            return 0, 0, []
+        urls = list(entries)
+        placeholders = ','.join('?' * len(urls))
+
+        with self._lock, self.conn:
+            known = dict(self.conn.execute(
+                f"SELECT url, is_nappy FROM sitemap_urls WHERE url IN ({placeholders})", urls
+            ))
+            rows = []
+            nappy_count = 0
+            for url, lastmod in entries.items():
+                is_nappy = known.get(url)
+                if is_nappy is None:
+                    is_nappy = int(classify(url))
+                nappy_count += is_nappy
+                rows.append((url, lastmod, is_nappy, self.today, self.today))
+            self.conn.executemany("""
+                INSERT INTO sitemap_urls (url, lastmod, is_nappy, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    lastmod = excluded.lastmod, last_seen = excluded.last_seen
+            """, rows)
+            due = {row[0] for row in self.conn.execute(f"""
+                SELECT url FROM sitemap_urls
+                WHERE url IN ({placeholders}) AND is_nappy = 1
+                  AND (crawled_on IS NULL OR crawled_on < ? OR crawled_lastmod IS NOT lastmod)
+            """, urls + [self.recrawl_before])}
+
+        return nappy_count, len(urls) - len(known), [url for url in urls if url in due]
+
+    def mark_crawled(self, urls):
+        """Remember the lastmod each URL had when it was fetched successfully"""
+        with self._lock, self.conn:
+            self.conn.executemany("""
+                UPDATE sitemap_urls SET crawled_lastmod = lastmod, crawled_on = ?
+                WHERE url = ?
+            """, [(self.today, url) for url in urls])
+
+    def forget_missing(self, days=SITEMAP_FORGET_DAYS):
+        """Drop URLs that have not appeared in any sitemap for `days`"""
+        cutoff = (datetime.now(LOCAL_TZ).date() - timedelta(days=days)).isoformat()
+        with self._lock, self.conn:
+            return self.conn.execute(
+                "DELETE FROM sitemap_urls WHERE last_seen < ?", (cutoff,)
+            ).rowcount
+
+PIPELINE_WORKERS = {'fetch': 4, 'parse': 2, 'evaluate': 1}
+MAX_PRODUCT_PAGES = int(os.environ.get('DEAL_MAX_PRODUCT_PAGES', '50'))
+SITEMAP_READER_THREADS = 4
+
+async def discover_stage(fetcher, seed_urls, url_queue, report,
+                         max_product_pages=MAX_PRODUCT_PAGES, max_depth=2, url_index=None,
+                         retailer=None):
+    """Stage 1: queue seed pages, then nappy product URLs streamed from sitemaps.
+
+    Sitemaps are stream-parsed in worker threads that hand URLs straight to
+    the bounded url_queue, so discovery pauses whenever fetching falls behind.
+    With a SitemapUrlIndex only new or changed product URLs are queued.
+    Sitemaps come from the retailer adapter; without one only seed_urls
+    are queued.
+    """
+    sitemap_seeds = retailer.sitemap_seeds if retailer else []
+    is_product_url = retailer.is_product_url if retailer else None
+    loop = asyncio.get_running_loop()
+    emitted_lock = threading.Lock()
+    emitted = [0]
+    queued = set(seed_urls)
+
+    for url in dict.fromkeys(seed_urls):
+        await url_queue.put(url)
+
+    stopped = threading.Event()
+
+    def put_url(loc):
+        # Blocks this thread until the fetch stage has room, but gives up
+        # once discovery has stopped so no reader is left waiting forever
+        future = asyncio.run_coroutine_threadsafe(url_queue.put(loc), loop)
+        while True:
+            try:
+                return future.result(timeout=0.5)
+            except FutureTimeoutError:
+                if stopped.is_set():
+                    future.cancel()
+                    raise RuntimeError("discovery stopped")
+
+    def queue_urls(urls):
+        for loc in urls:
+            with emitted_lock:
+                if emitted[0] >= max_product_pages or loc in queued:
+                    continue
+                queued.add(loc)
+                emitted[0] += 1
+            put_url(loc)
+
+    def read_sitemap(sitemap_url, response):
+        info = {}
+        summary = {'url': sitemap_url, 'url_count': 0, 'nappy_count': 0, 'new_count': 0,
+                   'due_count': 0, 'sub_sitemaps': []}
+        batch = []
+
+        def flush():
+            if url_index is None:
+                due = [loc for loc, _ in batch if is_product_url(loc)]
+                summary['nappy_count'] += len(due)
+                summary['new_count'] += len(batch)
+            else:
+                nappy_count, new_count, due = url_index.merge(batch, is_product_url)
+                summary['nappy_count'] += nappy_count
+                summary['new_count'] += new_count
+            summary['due_count'] += len(due)
+            batch.clear()
+            queue_urls(due)
+
+        started = time.perf_counter()
+        try:
+            for loc, lastmod in iter_sitemap_entries(response, info):
+                if info.get('is_index'):
+                    summary['sub_sitemaps'].append(loc)
+                    continue
+                summary['url_count'] += 1
+                batch.append((loc, lastmod))
+                if len(batch) >= SITEMAP_BATCH_SIZE:
+                    flush()
+            flush()
+        finally:
+            response.close()
+            # Streaming download and parsing overlap, so they share one span
+            METRICS.record('sitemap.stream_parse', time.perf_counter() - started)
+            METRICS.incr('sitemap.urls', summary['url_count'])
+        return summary
+
+    # Readers block on the bounded url_queue, so they get threads of their
+    # own: on the default executor they could take every thread the fetch
+    # workers need for robots lookups and requests, and deadlock the run
+    readers = ThreadPoolExecutor(max_workers=SITEMAP_READER_THREADS, thread_name_prefix='sitemap-reader')
+    pending = list(sitemap_seeds)
+    seen = set()
     try:
-        price = float(price_str.replace('$', ''))
-        return 5.0 <= price <= 100.0
-    except:
-        return False
+        for depth in range(max_depth + 1):
+            batch = [url for url in dict.fromkeys(pending) if url not in seen]
+            if not batch:
+                break
+            seen.update(batch)
+            pending = []
+
+            responses = await fetcher.fetch_many(batch, stream=True)
+            jobs = []
+            for sitemap_url, response in zip(batch, responses):
+                if isinstance(response, Exception):
+                    print(f"  ❌ Error accessing {sitemap_url}: {response}")
+                elif response is not None and response.status_code != 200:
+                    response.close()
+                elif response is not None:
+                    jobs.append(loop.run_in_executor(readers, read_sitemap, sitemap_url, response))
+
+            for summary in await asyncio.gather(*jobs, return_exceptions=True):
+                if isinstance(summary, Exception):
+                    print(f"  ❌ Sitemap parse error: {summary}")
+                    continue
+                report['sitemaps'].append(summary)
+                pending.extend(summary['sub_sitemaps'])
+                kind = "INDEX" if summary['sub_sitemaps'] else (
+                    f"{summary['url_count']} URLs, {summary['nappy_count']} nappy, "
+                    f"{summary['due_count']} new or changed"
+                )
+                print(f"  🗺️ {summary['url']}: {kind}")
+    finally:
+        stopped.set()
+        readers.shutdown(wait=False)
+
+    if url_index is not None and report['sitemaps']:
+        forgotten = url_index.forget_missing()
+        if forgotten:
+            print(f"  🧹 Forgot {forgotten} URLs no longer in any sitemap")
+    print(f"  🧭 Discovery done: {len(seed_urls)} seed pages + {emitted[0]} product pages queued")
+
+async def fetch_worker(fetcher, url_queue, html_queue, report):
+    """Stage 2: fetch queued URLs and hand the bodies to the parse stage"""
+    while True:
+        url = await url_queue.get()
+        if url is None:
+            return
+        try:
+            response = await fetcher.fetch(url)
+            if response is None:
+                continue
+            try:
+                report['pages'][url] = {'status': response.status_code}
+                if response.status_code != 200:
+                    print(f"  ❌ HTTP {response.status_code}: {url}")
+                    continue
+                body = response.content
+            finally:
+                response.close()
+            # Blocks while the parse stage is busy, bounding raw HTML in memory
+            await html_queue.put((url, body, getattr(response, 'encoding', None)))
+            del body
+        except Exception as e:
+            print(f"  ❌ Request error for {url}: {e}")
+
+def parse_page(url, html_content, retailer=None):
+    """Analyze one page and extract its products; returns no raw HTML.
+
+    Products are extracted by `retailer`, by default the adapter for url's
+    host; a page from an unknown host yields none.
+    """
+    page = analyze_html(html_content)
+    started = time.perf_counter()
+    retailer = retailer or retailer_for_url(url)
+    products = retailer.extract_products(html_content, url) if retailer else []
+    timings = dict(page['timings'], **{'parse.extract': time.perf_counter() - started})
+    return {
+        'url': url,
+        'analysis': analyze_page_content(html_content, url, page),
+        'products': products,
+        'bytes': len(html_content),
+        'timings': timings
+    }
+
+PARSE_WORKERS = int(os.environ.get('DEAL_PARSE_WORKERS', str(os.cpu_count() or 1)))
+SPOOL_THRESHOLD = 1024 * 1024  # Bodies above 1 MB go to the pool as a file path
+
+def read_page_source(body=None, path=None, encoding='utf-8'):
+    """Page text from raw bytes or a spooled file, which is removed once read"""
+    if path is not None:
+        with open(path, 'rb') as f:
+            body = f.read()
+        os.unlink(path)
+    if isinstance(body, bytes):
+        body = body.decode(encoding or 'utf-8', errors='replace')
+    return body
+
+def parse_page_source(url, body=None, path=None, encoding='utf-8', retailer=None):
+    """Process-pool entry point: parse raw bytes or a spooled file.
 
-async def debug_main():
-    """Main debug function - fully compliant approach"""
+    Returns the same small, picklable dict as parse_page (analysis dict
+    plus ProductRecord tuples).
+    """
+    return parse_page(url, read_page_source(body, path, encoding), retailer)
+
+def parse_rendered_source(url, body=None, path=None, retailer=None):
+    """Process-pool entry point for a browser-rendered page (see parse_rendered_page)"""
+    return parse_rendered_page(url, read_page_source(body, path), retailer)
+
+def spool_body(body):
+    """Write a large body to a temp file for the parse pool; returns the path"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    with tempfile.NamedTemporaryFile(prefix='deal-page-', suffix='.html', delete=False) as f:
+        f.write(body)
+    return f.name
+
+class ParsePool:
+    """Process pool that parses HTML on every core.
+
+    The async pipeline awaits parse(); workers receive raw bytes (or a
+    spooled file path for large pages) and send back compact records, never
+    soup objects.
+    """
+
+    def __init__(self, max_workers=PARSE_WORKERS):
+        self.max_workers = max(1, max_workers)
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        # Fork every worker now. Callers create the pool before starting any
+        # threads of their own, so no worker inherits a lock held mid-call
+        self.executor.submit(os.getpid).result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    async def parse(self, url, body=None, path=None, encoding='utf-8', retailer=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, parse_page_source, url, body, path, encoding, retailer
+        )
+
+    async def parse_rendered(self, url, body=None, path=None, retailer=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, parse_rendered_source, url, body, path, retailer
+        )
+
+async def parse_worker(html_queue, result_queue, parse_pool=None, inline=False, retailer=None):
+    """Stage 3: parse pages off the event loop (in the process pool if given).
+
+    inline=True parses on the event-loop thread, so a profiler sees it.
+    Products are extracted with the `retailer` adapter when one is given.
+    """
+    while True:
+        item = await html_queue.get()
+        if item is None:
+            return
+        url, body, encoding = item
+        del item
+        try:
+            if inline:
+                parsed = parse_page_source(url, body, None, encoding, retailer)
+            elif parse_pool is None:
+                parsed = await asyncio.to_thread(parse_page_source, url, body, None, encoding, retailer)
+            elif len(body) > SPOOL_THRESHOLD:
+                path = await asyncio.to_thread(spool_body, body)
+                parsed = await parse_pool.parse(url, path=path, encoding=encoding, retailer=retailer)
+            else:
+                parsed = await parse_pool.parse(url, body, encoding=encoding, retailer=retailer)
+        except Exception as e:
+            print(f"  ❌ Parse error for {url}: {e}")
+            continue
+        finally:
+            del body
+        await result_queue.put(parsed)
+
+async def evaluate_worker(result_queue, report):
+    """Stage 4: collect de-duplicated product records and page analyses.
+
+    Price checks run once over the whole run in evaluate_deals.
+    """
+    seen = set()
+    while True:
+        parsed = await result_queue.get()
+        if parsed is None:
+            return
+        url = parsed['url']
+        for name, seconds in parsed.get('timings', {}).items():
+            METRICS.record(name, seconds)
+        METRICS.incr('pages.parsed')
+        METRICS.incr('pages.parsed_bytes', parsed.get('bytes', 0))
+        products = parsed['products']
+        new = []
+        for record in products:
+            key = (record.retailer, product_key(record))
+            if key not in seen:
+                seen.add(key)
+                new.append(record)
+        report['products'].extend(new)
+        METRICS.incr('products.extracted', len(products))
+        report['pages'].setdefault(url, {'status': 200})
+        report['pages'][url].update(analysis=parsed['analysis'], product_count=len(products))
+        analysis = parsed['analysis']
+        print(f"  📄 {url}: {len(products)} products, {analysis['price_count']} prices, "
+              f"{analysis['nappy_keywords_count']} nappy keywords")
+
+async def run_pipeline(seed_urls, fetcher, workers=None, queue_size=8,
+                       max_product_pages=MAX_PRODUCT_PAGES, parse_pool=None,
+                       parse_inline=False, url_index=None, retailer=None):
+    """Run discover → fetch → parse → evaluate as concurrent stages.
+
+    Stages are joined by bounded queues, so fetching and parsing overlap and
+    a slow stage applies backpressure upstream instead of letting raw HTML
+    pile up. Returns a report with sitemap summaries, per-page analyses
+    (no HTML) and the evaluated ProductRecords.
+
+    With a SitemapUrlIndex the crawl is incremental: only new or changed
+    product URLs are fetched, and successful fetches are marked crawled.
+    `retailer` is the adapter whose sitemaps are discovered and whose
+    extractor parses every fetched page.
+    """
+    workers = dict(PIPELINE_WORKERS, **(workers or {}))
+    if parse_pool is not None:
+        # Keep every pool process busy
+        workers['parse'] = max(workers['parse'], parse_pool.max_workers)
+    report = {'sitemaps': [], 'pages': {}, 'products': []}
+
+    url_queue = asyncio.Queue(maxsize=queue_size)
+    html_queue = asyncio.Queue(maxsize=workers['parse'])
+    result_queue = asyncio.Queue(maxsize=queue_size)
+
+    fetchers = [
+        asyncio.create_task(fetch_worker(fetcher, url_queue, html_queue, report))
+        for _ in range(workers['fetch'])
+    ]
+    parsers = [
+        asyncio.create_task(parse_worker(html_queue, result_queue, parse_pool, parse_inline, retailer))
+        for _ in range(workers['parse'])
+    ]
+    evaluators = [
+        asyncio.create_task(evaluate_worker(result_queue, report))
+        for _ in range(workers['evaluate'])
+    ]
+
+    try:
+        with METRICS.span('stage.discover'):
+            await discover_stage(
+                fetcher, seed_urls, url_queue, report, max_product_pages,
+                url_index=url_index, retailer=retailer
+            )
+    finally:
+        # Shut stages down in order once everything upstream has drained
+        for stage, queue in ((fetchers, url_queue), (parsers, html_queue), (evaluators, result_queue)):
+            for _ in stage:
+                await queue.put(None)
+            await asyncio.gather(*stage)
+
+    if url_index is not None:
+        url_index.mark_crawled(url for url, page in report['pages'].items() if page['status'] == 200)
+    return report
+
+async def run_retailers(retailers, fetcher, listing_urls, **pipeline_kwargs):
+    """Run one pipeline per retailer, all at the same time.
+
+    The pipelines share the fetcher, so the RequestScheduler paces each host
+    on its own budget while bounding total concurrency, and the run takes as
+    long as the slowest retailer rather than the sum of them. listing_urls
+    maps retailer name to its seed pages. Returns the merged report, with
+    each retailer's own report under 'retailers'.
+    """
+    reports = await asyncio.gather(*(
+        run_pipeline(listing_urls.get(retailer.name, []), fetcher, retailer=retailer, **pipeline_kwargs)
+        for retailer in retailers
+    ), return_exceptions=True)
+
+    merged = {'sitemaps': [], 'pages': {}, 'products': [], 'retailers': {}}
+    for retailer, report in zip(retailers, reports):
+        if isinstance(report, Exception):
+            print(f"  ❌ {retailer.name} pipeline failed: {report}")
+            continue
+        merged['retailers'][retailer.name] = report
+        merged['sitemaps'].extend(report['sitemaps'])
+        merged['pages'].update(report['pages'])
+        merged['products'].extend(report['products'])
+        print(f"  🏪 {retailer.name}: {len(report['pages'])} pages, {len(report['products'])} products")
+    return merged
+
+def replay_snapshots(url=None, since=None, store=None):
+    """Re-run the parsers over stored snapshots instead of re-crawling.
+
+    Each distinct (url, content) pair is parsed once however many times it
+    was captured. Returns {(url, captured_at): [ProductRecord]}.
+    """
+    print("\n🔁 REPLAYING SNAPSHOTS")
+    print("=" * 50)
+
+    store = store or get_snapshot_store()
+    rows = store.history(url, since)
+    if not rows:
+        print("  ❌ No snapshots match")
+        return {}
+
+    parsed = {}
+    replayed = {}
+    for row in rows:
+        key = (row['url'], row['hash'])
+        if key not in parsed:
+            try:
+                parsed[key] = parse_page(row['url'], store.read_text(row['hash']))
+            except Exception as e:
+                print(f"  ❌ {row['url']} @ {row['captured_at']}: {e}")
+                continue
+        result = parsed[key]
+        replayed[(row['url'], row['captured_at'])] = result['products']
+        print(f"  📄 {row['url']} @ {row['captured_at']} [{row['hash'][:12]}]: "
+              f"{len(result['products'])} products, {result['analysis']['price_count']} prices")
+
+    print(f"\n  ✅ Replayed {len(rows)} snapshots ({len(parsed)} distinct pages parsed)")
+    return replayed
+
+PROFILE_PATH = 'deal_finder.pstats'
+
+async def debug_main(profile=False, browser=True, incremental=True, retailer_names=None):
+    """Main debug function - fully compliant approach
+
+    With profile=True pages are parsed on the main thread instead of the
+    process pool, so the cProfile run started by run_profiled sees them.
+    browser=False never launches crawl4ai, even for pages without products.
+    incremental=False ignores the sitemap URL index and fetches every
+    nappy product page (up to MAX_PRODUCT_PAGES per retailer).
+    retailer_names limits the run to those registered retailers.
+    """
     print("=" * 80)
     print("🔍 COMPLIANT DEBUG MODE - Respectful Website Analysis")
     print("⚖️ Only using robots.txt allowed methods")
     print("=" * 80)
     
-    # Step 1: Check what's actually allowed
-    print("\n1️⃣ CHECKING ROBOTS.TXT COMPLIANCE")
-    allowed_urls = check_robots_txt_compliance()
+    # Fork the parse workers before step 1 starts any threads; the pool
+    # serves both the HTTP pipelines and the browser fallback
+    pool = contextlib.nullcontext() if profile else ParsePool()
+    with pool as parse_pool:
+        # Step 1: Check what's actually allowed, for every retailer at once
+        print("\n1️⃣ CHECKING ROBOTS.TXT COMPLIANCE")
+        retailers = get_retailers(retailer_names)
+        with METRICS.span('stage.robots'):
+            checks = await asyncio.gather(*(
+                asyncio.to_thread(check_robots_txt_compliance, retailer) for retailer in retailers
+            ))
+        allowed_urls = [url for urls in checks for url in urls]
+        listing_urls = {
+            retailer.name: [url for url in urls if url in retailer.listing_urls]
+            for retailer, urls in zip(retailers, checks)
+        }
     
-    # Step 2: Debug sitemap approach (most legitimate)
-    print("\n2️⃣ DEBUGGING SITEMAP APPROACH") 
-    working_sitemaps = await debug_sitemap_thoroughly()
+        # Steps 2-4 run as one pipeline per retailer: sitemap discovery,
+        # fetching, parsing and evaluation overlap instead of waiting on each other
+        print("\n2️⃣ RUNNING DISCOVER → FETCH → PARSE → EVALUATE PIPELINES")
+        browse_urls = [url for urls in listing_urls.values() for url in urls]
+        url_index = SitemapUrlIndex() if incremental else contextlib.nullcontext()
+        with METRICS.span('stage.pipeline'), url_index as url_index:
+            async with AsyncFetcher() as fetcher:
+                report = await run_retailers(
+                    retailers, fetcher, listing_urls, parse_pool=parse_pool,
+                    parse_inline=profile, url_index=url_index
+                )
     
-    # Step 3: Test allowed browse pages manually
-    print("\n3️⃣ TESTING ALLOWED BROWSE PAGES")
-    manual_results = debug_manual_allowed_pages()
+        working_sitemaps = report['sitemaps']
+        manual_results = report['pages']
+        products = list(report['products'])
+        tiers = ['json' if manual_results.get(url, {}).get('product_count') else None for url in browse_urls]
     
-    # Step 4: Test with crawl4ai on allowed URLs only
-    print("\n4️⃣ TESTING COMPLIANT CRAWLING")
-    await debug_compliant_crawl()
+        # Step 3: Only pages without embedded products need the browser
+        print("\n3️⃣ BROWSER FALLBACK")
+        escalate = [url for url, tier in zip(browse_urls, tiers) if tier is None]
+        if escalate and browser and crawl4ai_available():
+            with METRICS.span('stage.render_fallback'):
+                rendered = await render_products(escalate, parse_pool, parse_inline=profile)
+            for url, rendered_products in rendered.items():
+                products.extend(rendered_products)
+                if rendered_products:
+                    tiers[browse_urls.index(url)] = 'browser'
+        elif escalate:
+            # The scheduled workflow reads this to decide whether to install a browser and re-run
+            METRICS.incr('pages.needs_browser', len(escalate))
+            print(f"  ⚠️ {len(escalate)} pages had no embedded products and the browser is disabled or unavailable")
+        else:
+            print("  ⚡ Embedded JSON covered every browse page - browser not needed")
+    
+        print(f"  📦 Products: {len(products)} "
+              f"({tiers.count('json')} pages via JSON, {tiers.count('browser')} via browser)")
+    
+    # Step 4: Rank today's products against history, record them and
+    # publish the dashboard feed
+    print("\n4️⃣ EVALUATING AND RECORDING PRICES")
+    with METRICS.span('stage.store'), PriceHistoryStore() as store:
+        with METRICS.span('stage.evaluate'):
+            evaluated = evaluate_deals(products, store.prior_stats(), include_invalid=True)
+        deal_table = [deal for deal in evaluated if deal['valid']]
+        rejected = [deal['record'] for deal in evaluated if not deal['valid']]
+        METRICS.incr('products.valid', len(deal_table))
+        METRICS.incr('products.invalid', len(rejected))
+        print(f"  🧮 {len(deal_table)} of {len(products)} products passed the price checks")
+        for rank, deal in enumerate(deal_table[:5], 1):
+            unit = f"${deal['unit_price']:.3f}/nappy" if deal['unit_price'] else "unit price unknown"
+            saving = f", {deal['score']:.0f}% off" if deal['score'] > 0 else ""
+            print(f"    {rank}. {deal['record'].name} - ${deal['record'].price:.2f} ({unit}{saving})")
+        recorded = store.record_products(
+            [deal['record'] for deal in evaluated],
+            invalid_keys={(product_key(record), record.retailer) for record in rejected}
+        )
+        print(f"  🗄️ Recorded {recorded} prices in {store.path} ({len(rejected)} flagged invalid)")
+        print(f"  🗄️ History dumped to {store.dump()}")
+        names = [retailer.name for retailer in retailers]
+        store.export_latest_deals(max_age_days=RECRAWL_DAYS, retailers=names)
+        store.export_deal_feed(max_age_days=RECRAWL_DAYS, retailers=names)
+    METRICS.write()
     
     # Step 5: Generate recommendations
     print("\n" + "=" * 80)
@@ -450,14 +2946,17 @@ async def debug_main():
     else:
         print("❌ No compliant URLs found - check robots.txt")
     
-    # Check manual results
+    if 'json' in tiers:
+        print(f"✅ Embedded JSON yielded products on {tiers.count('json')} pages - no browser needed there")
+    
+    # Check page results
     successful_manual = [url for url, data in manual_results.items() if data.get('status') == 200]
     if successful_manual:
         print(f"✅ {len(successful_manual)} URLs accessible via HTTP")
         
         # Check for member-only pricing
         member_only_detected = any(
-            data['analysis'].get('member_only_indicators', []) 
+            data.get('analysis', {}).get('member_only_indicators', []) 
             for data in manual_results.values()
         )
         
@@ -469,8 +2968,8 @@ async def debug_main():
         
         # Check for dynamic content
         no_prices_but_content = any(
-            data['analysis'].get('nappy_keywords_count', 0) > 0 and 
-            data['analysis'].get('price_count', 0) == 0
+            data.get('analysis', {}).get('nappy_keywords_count', 0) > 0 and 
+            data.get('analysis', {}).get('price_count', 0) == 0
             for data in manual_results.values()
         )
         
@@ -489,11 +2988,75 @@ async def debug_main():
     
     print("=" * 80)
 
+def run_profiled(main, path=PROFILE_PATH):
+    """Run a coroutine function under cProfile and print the hottest calls"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return asyncio.run(main())
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"\n🔬 Profile saved to {path} (view with: python -m pstats {path})")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+
+def build_cli():
+    parser = argparse.ArgumentParser(
+        description="Daily Australian nappy deal tracker (robots.txt compliant)"
+    )
+    parser.add_argument('--profile', action='store_true',
+                        help='run under cProfile and save deal_finder.pstats')
+    commands = parser.add_subparsers(dest='command')
+
+    run = commands.add_parser('run', help='full run: discover, fetch, parse, record (default)')
+    run.add_argument('--no-browser', action='store_true',
+                     help='never fall back to crawl4ai rendering')
+    run.add_argument('--full-crawl', action='store_true',
+                     help='fetch every nappy product page, not just new or changed ones')
+    run.add_argument('--retailer', action='append', choices=sorted(RETAILERS),
+                     help='only crawl this retailer (repeatable; default: all registered)')
+    commands.add_parser('robots', help='check robots.txt permissions')
+    commands.add_parser('sitemaps', help='discover and summarise sitemaps')
+    commands.add_parser('pages', help='fetch and analyse the allowed browse pages over HTTP')
+    commands.add_parser('crawl', help='render the allowed pages with crawl4ai')
+    replay = commands.add_parser('replay', help='re-run the parsers over stored page snapshots')
+    replay.add_argument('--url', help='only snapshots of this URL')
+    replay.add_argument('--since', help='only snapshots captured on or after this date (YYYY-MM-DD)')
+    return parser
+
+def main(argv=None):
+    args = build_cli().parse_args(argv)
+    command = args.command or 'run'
+    profile = args.profile or os.environ.get('DEAL_PROFILE') == '1'
+
+    if command == 'robots':
+        for retailer in get_retailers():
+            check_robots_txt_compliance(retailer)
+        return 0
+    if command == 'replay':
+        replay_snapshots(args.url, args.since)
+        return 0
+    if command == 'crawl' and not crawl4ai_available():
+        print("❌ crawl4ai is required for this command - pip install crawl4ai")
+        return 1
+
+    stages = {
+        'run': lambda: debug_main(
+            profile,
+            browser=not getattr(args, 'no_browser', False),
+            incremental=not getattr(args, 'full_crawl', False),
+            retailer_names=getattr(args, 'retailer', None)
+        ),
+        'sitemaps': debug_sitemap_thoroughly,
+        'pages': debug_manual_allowed_pages,
+        'crawl': debug_compliant_crawl
+    }
+    if profile:
+        run_profiled(stages[command])
+    else:
+        asyncio.run(stages[command]())
+    return 0
+
 # Run the compliant debug version
 if __name__ == "__main__":
-    if not CRAWL4AI_AVAILABLE:
-        print("❌ crawl4ai is required for this script")
-        exit(1)
-    
-    # Run compliant debug mode
-    asyncio.run(debug_main())
+    sys.exit(main())
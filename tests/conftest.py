@@ -0,0 +1,54 @@
+import hashlib
+import http.server
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """Serves whatever the test put in the server's routes dict.
+
+    200 responses carry an ETag and revalidate to 304 Not Modified.
+    """
+
+    routes = {}
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        route = self.routes.get(self.path)
+        if route is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        status, body = route if isinstance(route, tuple) else (200, route)
+        body = body.encode('utf-8') if isinstance(body, str) else body
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:16]
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        if status == 200:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def stand_in_server():
+    """Local HTTP server; returns (base_url, routes) with routes keyed by path"""
+    handler = type('Handler', (StandInHandler,), {'routes': {}})
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", handler.routes
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,41 @@
+import asyncio
+import gc
+import warnings
+
+import deal_finder
+
+
+def test_not_modified_response_closes_its_body_file(stand_in_server, tmp_path):
+    base_url, routes = stand_in_server
+    routes['/browse/baby'] = '<html><body>Huggies nappies $29.00</body></html>'
+    cache = deal_finder.ResponseCache(str(tmp_path))
+
+    async def fetch():
+        fetcher = deal_finder.AsyncFetcher(
+            cache=cache, scheduler=deal_finder.RequestScheduler(default_interval=0)
+        )
+        async with fetcher:
+            return await fetcher.fetch(f"{base_url}/browse/baby")
+
+    first = asyncio.run(fetch())
+    assert first.status_code == 200 and b'Huggies' in first.content
+    first.close()
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always', ResourceWarning)
+        response = asyncio.run(fetch())
+        assert response.from_cache
+        assert b'Huggies' in response.content
+        del response
+        gc.collect()
+    assert not [w for w in caught if issubclass(w.category, ResourceWarning)]
+
+
+def test_retry_after_wait_is_capped():
+    from urllib3.response import HTTPResponse
+
+    retries = deal_finder.HTTP_RETRIES.increment('GET', '/browse/baby', HTTPResponse(status=503))
+    long_wait = HTTPResponse(status=503, headers={'Retry-After': '3600'})
+    short_wait = HTTPResponse(status=429, headers={'Retry-After': '2'})
+    assert retries.get_retry_after(long_wait) == deal_finder.MAX_RETRY_AFTER
+    assert retries.get_retry_after(short_wait) == 2
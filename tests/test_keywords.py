@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from deal_finder import KEYWORD_CATEGORIES, KEYWORD_MATCHER, KeywordMatcher
+
+
+TEXTS = [
+    'flybuys member special',
+    'sign in to see member price. flybuys member special: exclusive member only',
+    'huggies nappies and babylove nappy pants, login to see price, sign in',
+    'access denied - captcha blocked by cloudflare / incapsula',
+    '',
+]
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_counts_match_str_count(text):
+    result = KEYWORD_MATCHER.match(text)
+    for category, terms in KEYWORD_CATEGORIES.items():
+        assert result[category] == {term: text.count(term) for term in terms}
+
+
+def test_overlapping_terms_are_both_counted():
+    counts = KEYWORD_MATCHER.count_terms('flybuys member special')
+    assert counts['flybuys member'] == 1
+    assert counts['member special'] == 1
+    assert counts['flybuys'] == 1
+
+
+def test_self_overlapping_term_matches_str_count():
+    matcher = KeywordMatcher({'x': ['aa', 'a']})
+    assert matcher.count_terms('aaaaa') == {'aa': 'aaaaa'.count('aa'), 'a': 5}
+
+
+def test_random_text_matches_str_count():
+    rng = random.Random(4)
+    terms = sorted({''.join(rng.choice('ab ') for _ in range(rng.randint(1, 4))).strip() or 'a'
+                    for _ in range(12)})
+    matcher = KeywordMatcher({'x': terms})
+    for _ in range(200):
+        text = ''.join(rng.choice('ab ') for _ in range(rng.randint(0, 40)))
+        assert matcher.match(text)['x'] == {term: text.count(term) for term in terms}, (terms, text)
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import deal_finder
+
+SUB_SITEMAPS = 12
+URLS_PER_SITEMAP = 20
+
+
+def sitemap_routes(base_url):
+    sub_sitemaps = [f"/sitemap/nappies-{i}.xml" for i in range(SUB_SITEMAPS)]
+    routes = {
+        '/robots.txt': "User-agent: *\nAllow: /\n",
+        '/sitemap.xml': (
+            '<?xml version="1.0"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            + ''.join(f"<sitemap><loc>{base_url}{path}</loc></sitemap>" for path in sub_sitemaps)
+            + '</sitemapindex>'
+        )
+    }
+    for i, path in enumerate(sub_sitemaps):
+        urls = [f"/product/huggies-nappies-{i}-{j}" for j in range(URLS_PER_SITEMAP)]
+        routes[path] = (
+            '<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            + ''.join(f"<url><loc>{base_url}{url}</loc></url>" for url in urls)
+            + '</urlset>'
+        )
+        for url in urls:
+            routes[url] = "<html><body><h1>Huggies nappies</h1><p>$29.00</p></body></html>"
+    return routes
+
+
+def test_discovery_with_more_sitemaps_than_executor_threads_finishes(stand_in_server, tmp_path):
+    base_url, routes = stand_in_server
+    routes.update(sitemap_routes(base_url))
+
+    retailer = deal_finder.RetailerAdapter()
+    retailer.name = 'Stand-in'
+    retailer.base_url = base_url
+    retailer.sitemap_seeds = [f"{base_url}/sitemap.xml"]
+
+    async def run():
+        # Far fewer default-executor threads than sitemaps being read
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=2))
+        fetcher = deal_finder.AsyncFetcher(
+            cache=deal_finder.ResponseCache(str(tmp_path / 'cache')),
+            scheduler=deal_finder.RequestScheduler(default_interval=0)
+        )
+        async with fetcher:
+            return await deal_finder.run_pipeline(
+                [], fetcher, queue_size=2, max_product_pages=SUB_SITEMAPS * URLS_PER_SITEMAP,
+                parse_inline=True, retailer=retailer
+            )
+
+    outcome = {}
+    # A deadlocked loop ignores asyncio timeouts, so watch it from outside
+    worker = threading.Thread(target=lambda: outcome.update(report=asyncio.run(run())), daemon=True)
+    worker.start()
+    worker.join(timeout=60)
+
+    assert not worker.is_alive(), "pipeline deadlocked"
+    assert len(outcome['report']['pages']) == SUB_SITEMAPS * URLS_PER_SITEMAP
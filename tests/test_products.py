@@ -0,0 +1,82 @@
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from deal_finder import LOCAL_TZ, PriceHistoryStore, ProductRecord, evaluate_deals, parse_pack_count
+
+
+@pytest.mark.parametrize('title, count', [
+    ('Huggies Size 4 Nappies 50 Pack', 50),
+    ('Huggies Ultimate Nappies Size 4 (10-15kg) | 50 pack', 50),
+    ('Babylove Nappy Pants Size 5 108 pack', 108),
+    ('Rascals Premium Nappies Size 3 2x54 Pack', 108),
+    ('Tooshies Nappies Size 6 Junior 16+kg Pack of 42', 42),
+    ('Coles Nappy Pants Size 5 13-18kg 40 Count', 40),
+    ('Mamia Ultra Dry Nappies Size 2 3-6kg | 54 nappies', 54),
+    ('Huggies Nappies Size 4', None),
+])
+def test_parse_pack_count_real_titles(title, count):
+    assert parse_pack_count(title) == count
+
+
+def record(name, price, product_id='1', was_price=None):
+    return ProductRecord(
+        retailer='Coles', product_id=product_id, name=name, brand='Huggies', size=None,
+        count=None, price=price, was_price=was_price, is_special=False,
+        url='https://www.coles.com.au/product/x', source='json'
+    )
+
+
+def test_evaluate_deals_unit_price_from_title():
+    deals = evaluate_deals([record('Huggies Size 4 Nappies 50 Pack', 25.0)])
+    assert deals[0]['unit_price'] == 0.5
+    assert deals[0]['record'].count == 50
+
+
+def test_rejected_products_are_recorded_invalid(tmp_path):
+    products = [
+        record('Huggies Size 4 Nappies 50 Pack', 25.0, product_id='1'),
+        record('Huggies Size 4 Nappies 50 Pack', 500.0, product_id='2'),
+    ]
+    evaluated = evaluate_deals(products, include_invalid=True)
+    assert [deal['valid'] for deal in evaluated] == [True, False]
+
+    rejected = {('2', 'Coles')}
+    with PriceHistoryStore(os.path.join(tmp_path, 'history.sqlite3')) as store:
+        store.record_products([deal['record'] for deal in evaluated], '2026-01-01', rejected)
+        rows = store.conn.execute(
+            "SELECT product_key, is_valid FROM price_history ORDER BY product_key"
+        ).fetchall()
+        assert [tuple(row) for row in rows] == [('1', 1), ('2', 0)]
+        today = store.todays_prices('2026-01-01')
+        assert [row['product_key'] for row in today] == ['1']
+        assert ('2', 'Coles') not in store.rolling_stats(until=date(2026, 1, 2))
+
+
+def test_prior_stats_leave_out_today(tmp_path):
+    today = datetime.now(LOCAL_TZ).date()
+    with PriceHistoryStore(os.path.join(tmp_path, 'history.sqlite3')) as store:
+        store.record_products([record('Huggies Size 4 Nappies 50 Pack', 30.0)],
+                              (today - timedelta(days=1)).isoformat())
+        store.record_products([record('Huggies Size 4 Nappies 50 Pack', 20.0)], today.isoformat())
+        assert store.rolling_stats()[('1', 'Coles')]['min'] == 20.0
+        assert store.prior_stats()[('1', 'Coles')]['median'] == 30.0
+
+
+def test_history_survives_losing_the_database(tmp_path):
+    path = os.path.join(tmp_path, 'history.sqlite3')
+    products = [
+        record('Huggies Size 4 Nappies 50 Pack', 25.0, product_id='1', was_price=30.0),
+        record('Huggies Size 4 Nappies 50 Pack', 500.0, product_id='2'),
+    ]
+    with PriceHistoryStore(path) as store:
+        store.record_products(products, '2026-01-01', {('2', 'Coles')})
+        store.dump()
+        before = [tuple(row) for row in store.conn.execute("SELECT * FROM price_history ORDER BY product_key")]
+
+    os.unlink(path)
+    with PriceHistoryStore(path) as store:
+        after = [tuple(row) for row in store.conn.execute("SELECT * FROM price_history ORDER BY product_key")]
+        assert after == before
+        assert [row['name'] for row in store.todays_prices('2026-01-01')] == [products[0].name]
@@ -0,0 +1,75 @@
+import asyncio
+from types import SimpleNamespace
+
+import deal_finder
+
+
+PRODUCT_PAGE = (
+    '<html><body><h1>Nappies</h1><p>$25.00</p>'
+    '<script type="application/ld+json">'
+    '{"@type": "Product", "name": "Huggies Ultimate Nappies Size 4 | 50 pack", "sku": "123",'
+    ' "offers": {"price": "25.00"}}'
+    '</script></body></html>'
+)
+BLOCKED_PAGE = '<html><body>Access denied - please complete the captcha</body></html>'
+
+
+class FakeCrawler:
+    """Stands in for crawl4ai's AsyncWebCrawler, serving fixed HTML per URL"""
+
+    pages = {}
+
+    def __init__(self, **kwargs):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def arun(self, url, **kwargs):
+        return SimpleNamespace(html=self.pages[url], links=[])
+
+
+def test_rendered_pages_are_parsed_in_the_pool(stand_in_server, tmp_path, monkeypatch):
+    base_url, routes = stand_in_server
+    routes['/robots.txt'] = "User-agent: *\nAllow: /\n"
+    deal_finder.get_robots_policy(base_url, cache=deal_finder.ResponseCache(str(tmp_path / 'cache')))
+
+    retailer = deal_finder.ColesAdapter()
+    retailer.base_url = base_url
+    monkeypatch.setitem(deal_finder.RETAILERS, 'Stand-in', retailer)
+    FakeCrawler.pages = {f"{base_url}/nappies": PRODUCT_PAGE, f"{base_url}/blocked": BLOCKED_PAGE}
+    monkeypatch.setattr(deal_finder, 'load_crawl4ai', lambda: FakeCrawler)
+    monkeypatch.setattr(deal_finder, '_snapshot_store', deal_finder.SnapshotStore(str(tmp_path / 'snapshots')))
+    monkeypatch.setattr(deal_finder, '_request_scheduler', deal_finder.RequestScheduler(default_interval=0))
+
+    with deal_finder.ParsePool(1) as pool:
+        products = asyncio.run(deal_finder.render_products(list(FakeCrawler.pages), pool))
+
+    assert list(products) == [f"{base_url}/nappies"]
+    assert [(p.retailer, p.count, p.price) for p in products[f"{base_url}/nappies"]] == [('Coles', 50, 25.0)]
+
+
+def test_crawl_without_urls_covers_every_retailer(stand_in_server, tmp_path, monkeypatch):
+    base_url, routes = stand_in_server
+    routes['/robots.txt'] = "User-agent: *\nAllow: /\n"
+    deal_finder.get_robots_policy(base_url, cache=deal_finder.ResponseCache(str(tmp_path / 'cache')))
+
+    retailers = {}
+    for name in ('First', 'Second'):
+        retailer = deal_finder.ColesAdapter()
+        retailer.name = name
+        retailer.base_url = base_url
+        retailer.robots_test_urls = [f"{base_url}/{name.lower()}/nappies", f"{base_url}/{name.lower()}/more"]
+        retailers[name] = retailer
+    monkeypatch.setattr(deal_finder, 'RETAILERS', retailers)
+    FakeCrawler.pages = {url: PRODUCT_PAGE for r in retailers.values() for url in r.robots_test_urls}
+    monkeypatch.setattr(deal_finder, 'load_crawl4ai', lambda: FakeCrawler)
+    monkeypatch.setattr(deal_finder, '_snapshot_store', deal_finder.SnapshotStore(str(tmp_path / 'snapshots')))
+    monkeypatch.setattr(deal_finder, '_request_scheduler', deal_finder.RequestScheduler(default_interval=0))
+
+    rendered = asyncio.run(deal_finder.debug_compliant_crawl(max_pages=1, parse_inline=True))
+
+    assert sorted(rendered) == [f"{base_url}/first/nappies", f"{base_url}/second/nappies"]
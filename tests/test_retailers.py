@@ -0,0 +1,29 @@
+import pytest
+
+from deal_finder import ColesAdapter, extract_embedded_products, parse_page, retailer_for_url
+
+
+PAGE = (
+    '<script type="application/ld+json">'
+    '{"@type": "Product", "name": "Huggies Ultimate Nappies Size 4 | 50 pack", "sku": "123",'
+    ' "offers": {"price": "25.00"}}'
+    '</script>'
+)
+
+
+def test_unknown_host_has_no_retailer():
+    assert retailer_for_url('https://www.coles.com.au/browse/baby').name == 'Coles'
+    assert retailer_for_url('https://shop.example.com/nappies') is None
+
+
+def test_unknown_host_yields_no_products():
+    assert parse_page('https://shop.example.com/nappies', PAGE)['products'] == []
+    with pytest.raises(ValueError):
+        extract_embedded_products(PAGE, 'https://shop.example.com/nappies')
+
+
+def test_explicit_retailer_parses_any_host():
+    retailer = ColesAdapter()
+    retailer.base_url = 'http://127.0.0.1:8000'
+    products = parse_page('http://127.0.0.1:8000/browse/baby', PAGE, retailer)['products']
+    assert [(p.retailer, p.count) for p in products] == [('Coles', 50)]
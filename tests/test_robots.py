@@ -0,0 +1,82 @@
+import asyncio
+import socket
+
+import pytest
+
+import deal_finder
+
+
+def load(origin, tmp_path):
+    return deal_finder.load_robots_policy(origin, cache=deal_finder.ResponseCache(str(tmp_path)))
+
+
+@pytest.mark.parametrize('status, allowed', [(503, False), (500, False), (429, False),
+                                             (401, False), (403, False), (404, True), (410, True)])
+def test_unreadable_robots_txt(stand_in_server, tmp_path, status, allowed):
+    base_url, routes = stand_in_server
+    routes['/robots.txt'] = (status, "")
+
+    policy = load(base_url, tmp_path)
+
+    assert policy.can_fetch(f"{base_url}/checkout") is allowed
+    if not allowed and status not in (401, 403):
+        assert policy.ttl == deal_finder.ROBOTS_RETRY_TTL
+
+
+def test_unreachable_robots_txt_disallows_everything(tmp_path):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    origin = f"http://127.0.0.1:{port}"
+
+    policy = load(origin, tmp_path)
+
+    assert policy.error
+    assert not policy.can_fetch(f"{origin}/browse/baby")
+    assert policy.ttl == deal_finder.ROBOTS_RETRY_TTL
+
+
+def test_robots_rules_are_applied(stand_in_server, tmp_path):
+    base_url, routes = stand_in_server
+    routes['/robots.txt'] = "User-agent: *\nDisallow: /checkout\n"
+
+    policy = load(base_url, tmp_path)
+
+    assert not policy.can_fetch(f"{base_url}/checkout")
+    assert policy.can_fetch(f"{base_url}/browse/baby")
+
+
+def test_unreadable_robots_txt_allows_no_urls(stand_in_server, tmp_path):
+    base_url, routes = stand_in_server
+    routes['/robots.txt'] = (503, "")
+    retailer = deal_finder.ColesAdapter()
+    retailer.base_url = base_url
+    retailer.robots_test_urls = [f"{base_url}/browse/baby", f"{base_url}/specials"]
+    deal_finder.get_robots_policy(base_url, cache=deal_finder.ResponseCache(str(tmp_path)))
+
+    assert deal_finder.check_robots_txt_compliance(retailer) == []
+    assert asyncio.run(deal_finder.debug_compliant_crawl(urls=retailer.robots_test_urls)) == {}
+
+
+def test_fetcher_reads_robots_txt_through_its_own_cache(stand_in_server, tmp_path, monkeypatch):
+    base_url, routes = stand_in_server
+    routes['/robots.txt'] = "User-agent: *\nDisallow: /checkout\n"
+    routes['/browse/baby'] = "<html>nappies</html>"
+
+    def shared_cache():
+        raise AssertionError("the shared response cache was used")
+
+    monkeypatch.setattr(deal_finder, 'get_response_cache', shared_cache)
+    cache = deal_finder.ResponseCache(str(tmp_path))
+
+    async def fetch():
+        fetcher = deal_finder.AsyncFetcher(
+            cache=cache, scheduler=deal_finder.RequestScheduler(default_interval=0)
+        )
+        async with fetcher:
+            return await fetcher.fetch(f"{base_url}/browse/baby")
+
+    response = asyncio.run(fetch())
+    assert response.status_code == 200
+    response.close()
+    assert f"{base_url}/robots.txt" in cache.index
@@ -0,0 +1,124 @@
+import asyncio
+from datetime import date, timedelta
+
+import deal_finder
+
+DAY = date(2026, 3, 1)
+
+
+def nappy(url):
+    return 'nappies' in url
+
+
+def open_index(tmp_path, on=DAY, recrawl_days=7):
+    index = deal_finder.SitemapUrlIndex(str(tmp_path / 'sitemap_urls.sqlite3'), recrawl_days=recrawl_days)
+    move_to(index, on, recrawl_days)
+    return index
+
+
+def move_to(index, day, recrawl_days=7):
+    index.today = day.isoformat()
+    index.recrawl_before = (day - timedelta(days=recrawl_days)).isoformat()
+
+
+def test_new_nappy_urls_are_due_and_classified_once(tmp_path):
+    classified = []
+
+    def classify(url):
+        classified.append(url)
+        return nappy(url)
+
+    with open_index(tmp_path) as index:
+        entries = [('https://shop/huggies-nappies-50', '2026-02-01'), ('https://shop/baby-wipes', '2026-02-01')]
+        assert index.merge(entries, classify) == (1, 2, ['https://shop/huggies-nappies-50'])
+        assert index.merge(entries, classify) == (1, 0, ['https://shop/huggies-nappies-50'])
+        assert classified == [url for url, _ in entries]
+
+
+def test_crawled_urls_are_due_again_only_when_lastmod_moves(tmp_path):
+    url = 'https://shop/huggies-nappies-50'
+    with open_index(tmp_path) as index:
+        index.merge([(url, '2026-02-01')], nappy)
+        index.mark_crawled([url])
+
+        assert index.merge([(url, '2026-02-01')], nappy)[2] == []
+        assert index.merge([(url, '2026-02-20')], nappy)[2] == [url]
+        index.mark_crawled([url])
+        assert index.merge([(url, '2026-02-20')], nappy)[2] == []
+
+
+def test_lastmod_appearing_or_disappearing_counts_as_a_change(tmp_path):
+    url = 'https://shop/huggies-nappies-50'
+    with open_index(tmp_path) as index:
+        index.merge([(url, None)], nappy)
+        index.mark_crawled([url])
+        assert index.merge([(url, None)], nappy)[2] == []
+        assert index.merge([(url, '2026-02-01')], nappy)[2] == [url]
+        index.mark_crawled([url])
+        assert index.merge([(url, None)], nappy)[2] == [url]
+
+
+def test_unchanged_urls_are_recrawled_after_the_window(tmp_path):
+    url = 'https://shop/huggies-nappies-50'
+    with open_index(tmp_path) as index:
+        index.merge([(url, '2026-02-01')], nappy)
+        index.mark_crawled([url])
+
+        move_to(index, DAY + timedelta(days=7))
+        assert index.merge([(url, '2026-02-01')], nappy)[2] == []
+        move_to(index, DAY + timedelta(days=8))
+        assert index.merge([(url, '2026-02-01')], nappy)[2] == [url]
+
+
+def test_forget_missing_drops_urls_gone_from_the_sitemaps(tmp_path):
+    with deal_finder.SitemapUrlIndex(str(tmp_path / 'sitemap_urls.sqlite3')) as index:
+        index.merge([('https://shop/huggies-nappies-50', None), ('https://shop/rascals-nappies-40', None)], nappy)
+        stale = (date.fromisoformat(index.today) - timedelta(days=31)).isoformat()
+        with index.conn:
+            index.conn.execute(
+                "UPDATE sitemap_urls SET last_seen = ? WHERE url = ?", (stale, 'https://shop/rascals-nappies-40')
+            )
+        assert index.forget_missing(days=30) == 1
+        assert [row[0] for row in index.conn.execute("SELECT url FROM sitemap_urls")] == [
+            'https://shop/huggies-nappies-50'
+        ]
+        # A forgotten URL that comes back is new again
+        assert index.merge([('https://shop/rascals-nappies-40', None)], nappy)[1] == 1
+
+
+def test_only_successful_fetches_are_marked_crawled(stand_in_server, tmp_path):
+    base_url, routes = stand_in_server
+    routes['/robots.txt'] = "User-agent: *\nAllow: /\n"
+    routes['/sitemap.xml'] = (
+        '<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        f"<url><loc>{base_url}/product/huggies-nappies-50</loc><lastmod>2026-02-01</lastmod></url>"
+        f"<url><loc>{base_url}/product/rascals-nappies-40</loc><lastmod>2026-02-01</lastmod></url>"
+        '</urlset>'
+    )
+    routes['/product/huggies-nappies-50'] = "<html><body><h1>Huggies nappies</h1><p>$29.00</p></body></html>"
+    routes['/product/rascals-nappies-40'] = (503, "Service Unavailable")
+
+    retailer = deal_finder.RetailerAdapter()
+    retailer.name = 'Stand-in'
+    retailer.base_url = base_url
+    retailer.sitemap_seeds = [f"{base_url}/sitemap.xml"]
+
+    async def run(index):
+        fetcher = deal_finder.AsyncFetcher(
+            cache=deal_finder.ResponseCache(str(tmp_path / 'cache')),
+            scheduler=deal_finder.RequestScheduler(default_interval=0)
+        )
+        async with fetcher:
+            return await deal_finder.run_pipeline(
+                [], fetcher, parse_inline=True, url_index=index, retailer=retailer
+            )
+
+    with deal_finder.SitemapUrlIndex(str(tmp_path / 'sitemap_urls.sqlite3')) as index:
+        first = asyncio.run(run(index))
+        assert {url: page['status'] for url, page in first['pages'].items()} == {
+            f"{base_url}/product/huggies-nappies-50": 200,
+            f"{base_url}/product/rascals-nappies-40": 503,
+        }
+
+        second = asyncio.run(run(index))
+        assert list(second['pages']) == [f"{base_url}/product/rascals-nappies-40"]